@@ -1,17 +1,78 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from pydantic import BaseModel
-from database import get_db
+from database import get_db, get_async_db
 from models import User
-from config import SECRET_KEY, ALGORITHM
+from config import (
+    SECRET_KEY,
+    ALGORITHM,
+    AUTH_TOKEN_CACHE_TTL,
+    AUTH_USER_CACHE_TTL,
+    AUTH_CACHE_SIZE,
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_QUEUE,
+)
 from fastapi.security import OAuth2PasswordBearer
+from metrics import Counter, span
+from ttl_cache import TTLCache
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
+# Password hashing context. Hashes below BCRYPT_ROUNDS are rehashed on the next successful login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+PASSWORD_HASH_REJECTIONS = Counter(
+    "password_hash_rejections_total", "Logins and signups turned away because the hashing pool was full"
+)
+
+
+class PasswordHashPool:
+    """
+    Runs bcrypt on a few dedicated threads (bcrypt releases the GIL), so a
+    burst of logins can't take over the threads and CPU other endpoints use.
+    At most `workers + queue_size` calls are running or waiting; beyond that
+    requests are rejected with 503 instead of queueing without bound.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_size: int = PASSWORD_HASH_QUEUE):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            PASSWORD_HASH_REJECTIONS.inc()
+            raise HTTPException(
+                status_code=503,
+                detail="Too many sign-ins in progress. Please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until bcrypt finishes, even if the client goes away first
+        future.add_done_callback(lambda _: self._slots.release())
+        with span("password_hash"):
+            return await asyncio.wrap_future(future)
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+password_hash_pool = PasswordHashPool()
 
 # Router instance
 router = APIRouter()
@@ -32,38 +93,96 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-# Dependency to get the current user
-def get_current_user(token: str, db: Session = Depends(get_db)) -> User:
+# Verified tokens -> their subject, kept no longer than the token's own expiry
+token_cache = TTLCache(AUTH_CACHE_SIZE)
+# Subject -> the user's column values (without the password hash)
+user_cache = TTLCache(AUTH_CACHE_SIZE)
+
+USER_CACHE_FIELDS = ("id", "username")
+
+
+def verify_token(token: str) -> str:
+    """
+    Returns the subject of a valid token, decoding each distinct token only
+    once per AUTH_TOKEN_CACHE_TTL.
+    """
+    username = token_cache.get(token)
+    if username is not None:
+        return username
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        user = db.query(User).filter(User.username == username).first()
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    username = payload.get("sub")
+    if username is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    ttl = AUTH_TOKEN_CACHE_TTL
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    token_cache.set(token, username, ttl)
+    return username
+
+
+def invalidate_user(username: str):
+    """
+    Drops a user from the identity cache, so their next request is checked
+    against the database again. Called automatically when a User is deleted
+    or updated through the ORM; call it after bulk deletes that bypass it.
+    """
+    user_cache.pop(username)
+
+
+@event.listens_for(User, "after_delete")
+@event.listens_for(User, "after_update")
+def _invalidate_changed_user(mapper, connection, target):
+    # A renamed user is cached under their previous username
+    for username in [target.username, *inspect(target).attrs.username.history.deleted]:
+        invalidate_user(username)
+
+
+# Dependency to get the current user
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    username = verify_token(token)
+
+    cached = user_cache.get(username)
+    if cached is not None:
+        # Attach the cached identity to this session without a SELECT
+        user = User(**cached)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    user = db.query(User).filter(User.username == username).first()
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    user_cache.set(username, {field: getattr(user, field) for field in USER_CACHE_FIELDS}, AUTH_USER_CACHE_TTL)
+    return user
 
 # API endpoints
 @router.post("/signup")
-def signup(request: SignupRequest, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.username == request.username).first():
+async def signup(request: SignupRequest, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.execute(select(User.id).where(User.username == request.username))
+    if existing.first():
         raise HTTPException(status_code=400, detail="Username already exists")
-    hashed_password = pwd_context.hash(request.password)
+    hashed_password = await password_hash_pool.run(pwd_context.hash, request.password)
     user = User(username=request.username, password=hashed_password)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
     return {"message": "User signed up successfully."}
 
 @router.post("/login")
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     username = request.username
     password = request.password
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not pwd_context.verify(password, user.password):
+    user = (await db.execute(select(User).where(User.username == username))).scalars().first()
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    valid, new_hash = await password_hash_pool.run(pwd_context.verify_and_update, password, user.password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored with an outdated cost; upgrade it now that we have the password
+        user.password = new_hash
+        await db.commit()
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
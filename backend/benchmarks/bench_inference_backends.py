@@ -0,0 +1,110 @@
+"""
+Summarizer latency, throughput and memory per inference backend (pytorch,
+quantized, onnx) on the product descriptions in DATABASE_URL.
+
+Seed the database first (python create_tables.py). Each backend runs in its
+own process so that peak memory is measured in isolation. The onnx backend
+needs `pip install optimum[onnxruntime]`; a backend that can't be set up
+falls back to pytorch, which the "backend" column shows.
+
+    python benchmarks/bench_inference_backends.py --backends pytorch quantized onnx --repeat 3
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_descriptions(limit: int):
+    from database import SessionLocal
+    from models import Product
+
+    db = SessionLocal()
+    try:
+        rows = db.query(Product.description).filter(Product.description.isnot(None)).limit(limit).all()
+    finally:
+        db.close()
+    return [row.description for row in rows]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(backend: str, texts, repeat: int, batch_size: int, results):
+    from config import SUMMARIZER_MODEL
+    from inference import summarize_texts
+    from model_registry import build_pipeline, registry
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    summarizer = build_pipeline("summarization", SUMMARIZER_MODEL, backend)
+    load_s = time.perf_counter() - started
+    registry.set("summarizer", summarizer)
+
+    # One text at a time: request latency
+    summarize_texts(texts[:1], batch_size=1)  # warm-up
+    latencies = []
+    for _ in range(repeat):
+        for text in texts:
+            started = time.perf_counter()
+            summarize_texts([text], batch_size=1)
+            latencies.append(time.perf_counter() - started)
+
+    # Whole list in padded batches: throughput
+    started = time.perf_counter()
+    for _ in range(repeat):
+        summarize_texts(texts, batch_size=batch_size)
+    throughput = len(texts) * repeat / (time.perf_counter() - started)
+
+    latencies.sort()
+    results.put({
+        "requested": backend,
+        "backend": summarizer.inference_backend,
+        "load_s": load_s,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "texts_per_s": throughput,
+        "model_mb": peak_rss_mb() - baseline,
+        "peak_mb": peak_rss_mb(),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare summarizer inference backends.")
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "quantized", "onnx"])
+    parser.add_argument("--texts", type=int, default=50, help="Product descriptions to summarize")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the descriptions")
+    parser.add_argument("--batch-size", type=int, default=16, help="Batch size for the throughput pass")
+    args = parser.parse_args()
+
+    texts = load_descriptions(args.texts)
+    if not texts:
+        raise SystemExit("No product descriptions found; run create_tables.py first.")
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{len(texts)} descriptions, {args.repeat} passes")
+    print(f"{'requested':<11}{'backend':<11}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'texts/s':>9}"
+          f"{'model MB':>10}{'peak MB':>9}")
+    for backend in args.backends:
+        results = context.Queue()
+        process = context.Process(target=measure, args=(backend, texts, args.repeat, args.batch_size, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{backend:<11}failed (exit code {process.exitcode})")
+            continue
+        r = results.get()
+        print(f"{r['requested']:<11}{r['backend']:<11}{r['load_s']:>8.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+              f"{r['texts_per_s']:>9.1f}{r['model_mb']:>10.0f}{r['peak_mb']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Load test for torch thread settings: --processes worker processes (standing
+in for uvicorn workers) each load the summarizer and serve --concurrency
+client threads that summarize product descriptions back to back.
+
+Settings compared:
+  default  every process uses all cores with no limit on concurrent model calls
+           (what torch does out of the box)
+  auto     TORCH_THREADS=auto with INFERENCE_CONCURRENCY=--inference-concurrency
+  N        N intra-op threads per call, same concurrency limit as auto
+
+Reads the descriptions from DATABASE_URL; run create_tables.py first.
+
+    python benchmarks/bench_inference_threads.py --processes 4 --concurrency 4 --settings default auto 2
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def setting_env(setting: str, processes: int, concurrency: int, inference_concurrency: int, cores: int) -> dict:
+    if setting == "default":
+        return {
+            "TORCH_THREADS": str(cores),
+            "TORCH_INTEROP_THREADS": str(cores),
+            "INFERENCE_CONCURRENCY": str(concurrency),
+        }
+    return {
+        "TORCH_THREADS": setting,
+        "TORCH_INTEROP_THREADS": "auto",
+        "MODEL_PROCESSES": str(processes),
+        "INFERENCE_CONCURRENCY": str(inference_concurrency),
+    }
+
+
+def worker(env: dict, texts, concurrency: int, duration: float, barrier, results):
+    os.environ.update(env)
+    from inference import summarize_texts
+    from model_registry import registry
+
+    registry.get("summarizer")
+    summarize_texts(texts[:1], batch_size=1)  # warm-up
+    barrier.wait()
+
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(offset: int):
+        i = offset
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            summarize_texts([texts[i % len(texts)]], batch_size=1)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+            i += concurrency
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(latencies)
+
+
+def run_setting(setting: str, args, texts, cores: int) -> dict:
+    env = setting_env(setting, args.processes, args.concurrency, args.inference_concurrency, cores)
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(args.processes)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(env, texts, args.concurrency, args.duration, barrier, results))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    latencies = sorted(l for _ in processes for l in results.get())
+    for process in processes:
+        process.join()
+
+    def percentile(p: float) -> float:
+        return latencies[int(p * (len(latencies) - 1))] * 1000
+
+    return {
+        "calls": len(latencies),
+        "calls_per_s": len(latencies) / args.duration,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test summarizer throughput under torch thread settings.")
+    parser.add_argument("--processes", type=int, default=2, help="Worker processes, like uvicorn --workers")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests per process")
+    parser.add_argument("--inference-concurrency", type=int, default=1, help="INFERENCE_CONCURRENCY for non-default settings")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load per setting")
+    parser.add_argument("--settings", nargs="+", default=["default", "auto"])
+    args = parser.parse_args()
+
+    from database import SessionLocal
+    from model_registry import available_cores
+    from models import Product
+
+    db = SessionLocal()
+    try:
+        texts = [row.description for row in db.query(Product.description).filter(Product.description.isnot(None))]
+    finally:
+        db.close()
+    if not texts:
+        raise SystemExit("No product descriptions found; run create_tables.py first.")
+
+    cores = available_cores()
+    print(f"{cores} cores, {args.processes} processes x {args.concurrency} concurrent requests, {args.duration:.0f}s each")
+    print(f"{'setting':<10}{'calls':>8}{'calls/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for setting in args.settings:
+        r = run_setting(setting, args, texts, cores)
+        print(f"{setting:<10}{r['calls']:>8}{r['calls_per_s']:>10.2f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
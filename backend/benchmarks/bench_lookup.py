@@ -0,0 +1,136 @@
+"""
+Lookup latency for the chatbot's substring searches with and without the
+pg_trgm GIN indexes.
+
+Runs against the Postgres database in DATABASE_URL. Use a scratch database:
+the products table is topped up with synthetic rows until it holds --rows rows.
+
+    python benchmarks/bench_lookup.py --rows 1000000 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from create_tables import SEARCH_INDEXES, create_search_indexes
+from database import engine, SessionLocal
+from models import Base, Product, Supplier
+from search import search, contains
+
+SEED_BATCH = 100_000
+WORDS = ["Laptop", "Phone", "Desktop", "Monitor", "Router", "Camera", "Speaker", "Watch", "Tablet", "Blender"]
+BRANDS = [f"Brand {chr(65 + i)}" for i in range(26)]
+
+
+def seed(rows: int):
+    """
+    Adds synthetic suppliers and products until the products table has `rows` rows.
+    """
+    Base.metadata.create_all(bind=engine)
+    create_search_indexes()
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT count(*) FROM suppliers")).scalar() == 0:
+            conn.execute(text(
+                "INSERT INTO suppliers (name, contact_info, product_categories_offered) "
+                "SELECT 'Supplier ' || i, 'sales' || i || '@example.com', "
+                "(ARRAY[:w0, :w1, :w2, :w3, :w4])[1 + i % 5] || ',' || substr(md5(i::text), 1, 6) "
+                "FROM generate_series(1, 10000) AS i"
+            ), {f"w{i}": WORDS[i].lower() + "s" for i in range(5)})
+        existing = conn.execute(text("SELECT count(*) FROM products")).scalar()
+
+    words = "ARRAY[" + ", ".join(f"'{w}'" for w in WORDS) + "]"
+    brands = "ARRAY[" + ", ".join(f"'{b}'" for b in BRANDS) + "]"
+    for start in range(existing, rows, SEED_BATCH):
+        end = min(rows, start + SEED_BATCH)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO products (name, brand, price, category, description, supplier_id) "
+                f"SELECT {words}[1 + i % 10] || ' ' || substr(md5(i::text), 1, 8) || ' ' || i, "
+                f"{brands}[1 + i % 26] || ' ' || substr(md5((i * 7)::text), 1, 4), "
+                "round((random() * 3000)::numeric, 2), "
+                f"lower({words}[1 + i % 10]), "
+                "'Synthetic product ' || i || ' with ' || md5(i::text), "
+                "1 + i % 10000 "
+                "FROM generate_series(:start, :end) AS i"
+            ), {"start": start + 1, "end": end})
+        print(f"Seeded {end} products")
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE products"))
+        conn.execute(text("ANALYZE suppliers"))
+
+
+def sample_terms(queries: int):
+    """
+    Picks search terms that occur in the data: name and brand fragments and category words.
+    """
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT name, brand FROM products TABLESAMPLE SYSTEM (1) LIMIT :n"
+        ), {"n": queries}).all()
+    names = [name.split()[1][:6] for name, _ in rows]
+    brands = [brand.split()[-1] for _, brand in rows]
+    categories = [random.choice(WORDS).lower() for _ in rows]
+    return names, brands, categories
+
+
+def time_lookups(db, terms, lookup):
+    latencies = []
+    for term in terms:
+        started = time.perf_counter()
+        lookup(db, term)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "max": latencies[-1],
+    }
+
+
+LOOKUPS = {
+    "product name (best match)": lambda db, term: search(db.query(Product), Product.name, term).first(),
+    "product brand (page of 50)": lambda db, term: db.query(Product).filter(contains(Product.brand, term)).limit(50).all(),
+    "supplier category (page of 50)": lambda db, term: db.query(Supplier).filter(
+        contains(Supplier.product_categories_offered, term)
+    ).limit(50).all(),
+}
+
+
+def run(rows: int, queries: int):
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("This benchmark needs Postgres with pg_trgm; point DATABASE_URL at a scratch database.")
+
+    seed(rows)
+    names, brands, categories = sample_terms(queries)
+    terms = dict(zip(LOOKUPS, (names, brands, categories)))
+
+    print(f"\n{'lookup':<32}{'indexes':<10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for label, lookup in LOOKUPS.items():
+        for indexed in (True, False):
+            db = SessionLocal()
+            try:
+                if not indexed:
+                    # Dropped inside the transaction and restored by the rollback below
+                    for index in SEARCH_INDEXES:
+                        db.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+                stats = time_lookups(db, terms[label], lookup)
+            finally:
+                db.rollback()
+                db.close()
+            print(f"{label:<32}{'trgm' if indexed else 'none':<10}"
+                  f"{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['max']:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark trigram-indexed product and supplier lookups.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Products to seed before measuring")
+    parser.add_argument("--queries", type=int, default=200, help="Lookups per measurement")
+    args = parser.parse_args()
+    run(args.rows, args.queries)
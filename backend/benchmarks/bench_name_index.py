@@ -0,0 +1,124 @@
+"""
+Lookup latency of the in-memory product name index (name_index.py) on a
+synthetic catalog, by kind of query: exact names, names with a typo, names
+with their brand in front, a brand alone, a first word alone and short
+model numbers. Reports p50/p95/p99/max in ms and, where the query was made
+from a product, how often that product came back first.
+
+Needs no database: the index is filled straight from generated rows.
+
+    python benchmarks/bench_name_index.py --rows 1000000 --queries 2000
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The index module imports the database module; nothing here connects to it
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from config import NAME_INDEX_MAX_CANDIDATES
+from name_index import NameIndex
+
+SYLLABLES = [
+    onset + vowel
+    for onset in ["", "b", "c", "d", "f", "g", "h", "k", "l", "m", "n", "p", "r", "s", "t", "v", "w", "z",
+                  "br", "ch", "cl", "dr", "fl", "gr", "pr", "sh", "st", "th", "tr"]
+    for vowel in ["a", "e", "i", "o", "u", "ai", "ea", "ou"]
+]
+SERIES = ["Pro", "Max", "Mini", "Ultra", "Plus", "Air", "Lite", "S", "X", "SE"]
+
+
+def word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+
+def catalog(rows: int, seed: int):
+    """
+    (id, name, brand, updated_at) rows: names are one or two made-up words,
+    often a series and a model number; brands come from a pool of 2,000.
+    """
+    rng = random.Random(seed)
+    brands = [word(rng) for _ in range(2000)]
+    lines = [word(rng) for _ in range(rows // 20 + 1)]
+    for product_id in range(1, rows + 1):
+        parts = [rng.choice(lines)]
+        if rng.random() < 0.5:
+            parts.append(word(rng))
+        if rng.random() < 0.6:
+            parts.append(rng.choice(SERIES))
+        if rng.random() < 0.7:
+            parts.append(f"{rng.choice(string.ascii_uppercase)}{rng.randint(1, 9999)}")
+        yield product_id, " ".join(parts), rng.choice(brands), None
+
+
+def typo(rng: random.Random, text: str) -> str:
+    i = rng.randrange(len(text))
+    edit = rng.choice(("drop", "swap", "replace"))
+    if edit == "drop":
+        return text[:i] + text[i + 1:]
+    if edit == "swap" and i + 1 < len(text):
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text[:i] + rng.choice(string.ascii_lowercase) + text[i + 1:]
+
+
+def query_sets(rows: list, queries: int, seed: int):
+    """
+    Query kind -> list of (query, product id it was made from, or None).
+    """
+    rng = random.Random(seed + 1)
+    sample = rng.sample(rows, min(queries, len(rows)))
+    return {
+        "exact name": [(name, product_id) for product_id, name, _, _ in sample],
+        "name with a typo": [(typo(rng, name), product_id) for product_id, name, _, _ in sample],
+        "brand + name": [(f"{brand} {name}", product_id) for product_id, name, brand, _ in sample],
+        "brand alone": [(brand, None) for _, _, brand, _ in sample],
+        "first word alone": [(name.split()[0], None) for _, name, _, _ in sample],
+        "model number": [(str(rng.randint(1, 99)), None) for _ in sample],
+    }
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(rows: int, queries: int, seed: int, max_candidates: int):
+    before = max_rss_mb()
+    started = time.perf_counter()
+    data = list(catalog(rows, seed))
+    index = NameIndex(max_candidates=max_candidates)
+    index.update(data)
+    print(f"Indexed {len(index):,} products in {time.perf_counter() - started:.1f}s, "
+          f"{len(index.gram_ids):,} trigrams, max RSS +{max_rss_mb() - before:,.0f} MB")
+
+    print(f"\n{'query':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'matched':>10}{'first':>10}")
+    for label, items in query_sets(data, queries, seed).items():
+        latencies, matched, first = [], 0, 0
+        for text, product_id in items:
+            started = time.perf_counter()
+            hits = index.lookup(text, limit=1)
+            latencies.append((time.perf_counter() - started) * 1000)
+            matched += bool(hits)
+            first += bool(hits) and hits[0][0] == product_id
+        latencies.sort()
+        print(f"{label:<20}{statistics.median(latencies):>10.3f}{latencies[int(len(latencies) * 0.95) - 1]:>10.3f}"
+              f"{latencies[int(len(latencies) * 0.99) - 1]:>10.3f}{latencies[-1]:>10.3f}"
+              f"{matched / len(items):>10.0%}"
+              f"{first / len(items) if items[0][1] is not None else float('nan'):>10.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the in-memory product name index.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic products to index")
+    parser.add_argument("--queries", type=int, default=2000, help="Lookups per kind of query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-candidates", type=int, default=NAME_INDEX_MAX_CANDIDATES,
+                        help="Products a lookup may score before giving up")
+    args = parser.parse_args()
+    run(args.rows, args.queries, args.seed, args.max_candidates)
@@ -0,0 +1,116 @@
+"""
+Microbenchmark for intent routing: the precompiled single-pass router against
+the previous parse_query, which rebuilt its pattern dict and tried each regex
+in turn on every call. Also checks that both agree on a set of sample queries.
+
+    python benchmarks/bench_parse_query.py --iterations 200000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import INTENTS, IntentRouter, intent_router
+
+QUERIES = [
+    "Hello",
+    "list products under $500",
+    "Show me products above 1299.99.",
+    "compare Super Laptop with UltraPhone",
+    "compare Super Laptop, UltraPhone and Smart Watch",
+    "show me all products by brand Brand A",
+    "Which suppliers provide laptops?",
+    "tell me about suppliers that offer smartphones",
+    "give me details about product Super Laptop",
+    "what is the warranty on refurbished monitors",
+]
+
+
+def legacy_parse_query(query):
+    """
+    The regex loop parse_query used before the router, minus logging.
+    product_details read group 4 of a three-group pattern and so always
+    raised; it is given group 3 here so the results can be compared.
+    """
+    query_lower = query.lower().strip()
+    intent = None
+    entities = {}
+    patterns = {
+        "greeting": r"^(hello|hi|hey|greetings)\.?$",
+        "price_filter": r"^(show me|list)\s+products\s+(under|above)\s+\$?(\d+\.?\d*)\.?$",
+        "compare_products": r"^compare\s+([\w\s]+)\s+with\s+([\w\s]+)\.?$",
+        "fetch_products": r"^(show me|list|display)\s+(all\s+)?products\s+(by|for|under)\s+brand\s+([\w\s]+)\.?$",
+        "fetch_suppliers": r"^(which|what|list|tell me about)\s+suppliers\s+(that\s+)?(provide|offer)\s+([\w\s]+)\.?$",
+        "product_details": r"^(give me|provide|show)\s+details\s+(of|about|for)\s+product\s+([\w\s]+)\.?$",
+        "general_query": r".*",
+    }
+    for key, pattern in patterns.items():
+        match = re.match(pattern, query_lower)
+        if match:
+            intent = key
+            if key == "price_filter":
+                entities["filter_type"] = match.group(2).strip()
+                entities["price"] = float(match.group(3).strip())
+            elif key == "compare_products":
+                entities["product_a"] = match.group(1).strip()
+                entities["product_b"] = match.group(2).strip()
+            elif key == "fetch_products":
+                entities["brand"] = match.group(4).strip()
+            elif key == "fetch_suppliers":
+                entities["category"] = match.group(4).strip()
+            elif key == "product_details":
+                entities["product_name"] = match.group(3).strip()
+            break
+    return {"intent": intent, "entities": entities}
+
+
+def padded_router(extra: int) -> IntentRouter:
+    """
+    A router with `extra` additional intents ahead of the real ones, to show
+    that matching time stays flat as intents are added.
+    """
+    filler = [(f"filler_{i}", (f"filler{i}",), rf"filler{i}\s+(?P<thing>\w+)") for i in range(extra)]
+    return IntentRouter(filler + INTENTS)
+
+
+def per_call_us(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for i in range(iterations):
+        fn(QUERIES[i % len(QUERIES)])
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def check_agreement():
+    for query in QUERIES:
+        old, new = legacy_parse_query(query), intent_router.route(query)
+        if old["intent"] == "general_query":
+            # The router also hands the question on to general_query
+            new = {**new, "entities": {k: v for k, v in new["entities"].items() if k != "question"}}
+        if old["intent"] == "compare_products":
+            # The router lists any number of products; the legacy pattern only took two
+            old = {**old, "entities": {"products": (old["entities"]["product_a"], old["entities"]["product_b"])}}
+        if query.startswith("compare") and old["intent"] == "general_query":
+            continue  # more than two products
+        if old != new:
+            raise SystemExit(f"Mismatch for {query!r}: {old} != {new}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parse_query intent routing.")
+    parser.add_argument("--iterations", type=int, default=200_000, help="Calls per variant")
+    args = parser.parse_args()
+
+    check_agreement()
+    print(f"{'variant':<28}{'us/call':>10}")
+    print(f"{'legacy regex loop':<28}{per_call_us(legacy_parse_query, args.iterations):>10.2f}")
+    print(f"{'compiled router':<28}{per_call_us(intent_router.route, args.iterations):>10.2f}")
+    for extra in (25, 100):
+        router = padded_router(extra)
+        print(f"{f'compiled router +{extra} intents':<28}{per_call_us(router.route, args.iterations):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
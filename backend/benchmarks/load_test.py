@@ -0,0 +1,380 @@
+"""
+Load test for the API: seeds a synthetic catalog, boots the app under
+uvicorn in a child process and drives a weighted mix of chat intents,
+logins and signups from concurrent clients. Reports p50/p95/p99 latency
+and requests/s per operation, and writes them as JSON for comparing commits.
+
+The database is DATABASE_URL if set (e.g. a scratch Postgres), otherwise a
+SQLite file in the temp directory. Seeding drops and recreates every table,
+so never point it at real data; --no-seed reuses what a previous run loaded.
+The model pipelines are replaced by fakes that sleep --model-latency-ms per
+call, unless --real-models is given.
+
+    python benchmarks/load_test.py --products 100000 --concurrency 32 --duration 60 --output results.json
+    python benchmarks/load_test.py --mix price_filter=3,login=1 --workers 4
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from urllib.parse import urlencode
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+# Relative weights of the operations clients send
+DEFAULT_MIX = {
+    "product_details": 20,
+    "fetch_products": 15,
+    "price_filter": 20,
+    "fetch_suppliers": 10,
+    "compare_products": 10,
+    "general_query": 5,
+    "greeting": 5,
+    "login": 10,
+    "signup": 5,
+}
+
+ADJECTIVES = ["Swift", "Smart", "Ultra", "Compact", "Pro", "Eco", "Prime", "Nova", "Turbo", "Classic"]
+NOUNS = ["Laptop", "Phone", "Tablet", "Headphones", "Monitor", "Keyboard", "Camera", "Speaker", "Watch", "Blender"]
+# Categories the demo suppliers from create_tables.py offer
+CATEGORIES = ["laptops", "phones", "computers", "accessories", "home appliances", "kitchen gadgets",
+              "smartphones", "tablets", "wearables"]
+WORDS = ["durable", "wireless", "battery", "display", "design", "performance", "portable", "premium", "fast",
+         "quiet", "energy", "efficient", "lightweight", "sleek", "reliable", "features", "storage", "sound"]
+QUESTIONS = [
+    "something quiet for a small apartment",
+    "what is good for working on the train",
+    "a gift for someone who likes cooking",
+    "which devices have long battery life",
+]
+
+LOGIN_USERS = 20
+PASSWORD = "load-test-password"
+
+
+def product_name(i: int) -> str:
+    return f"{ADJECTIVES[i % len(ADJECTIVES)]} {NOUNS[i // len(ADJECTIVES) % len(NOUNS)]} {i}"
+
+
+def write_catalog(path: str, products: int, brands: int, seed: int):
+    """
+    Writes `products` synthetic products as JSONL for ingest.py.
+    """
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(products):
+            f.write(json.dumps({
+                "name": product_name(i),
+                "brand": f"Brand {i % brands}",
+                "price": round(rng.uniform(5, 3000), 2),
+                "category": rng.choice(CATEGORIES),
+                "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40))),
+                "supplier_id": rng.randint(1, 4),
+            }) + "\n")
+
+
+def seed_database(products: int, brands: int, seed: int):
+    from create_tables import init_db
+    from ingest import ingest
+
+    init_db()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "products.jsonl")
+        write_catalog(path, products, brands, seed)
+        ingest(path, "products", chunk_size=5000, drop=False)
+
+
+class FakePipeline:
+    """
+    Stands in for a transformers pipeline: sleeps `latency` seconds per call
+    and returns output of the real pipeline's shape.
+    """
+
+    def __init__(self, task: str, latency: float):
+        self.task = task
+        self.latency = latency
+
+    def __call__(self, inputs, **kwargs):
+        time.sleep(self.latency)
+        if self.task == "summarization":
+            return [{"summary_text": " ".join(text.split()[:12])} for text in inputs]
+        if self.task == "text-generation":
+            return [[{"generated_text": f"{text} Here is what I found."}] for text in inputs]
+        # feature-extraction: one (1, tokens, dim) array per text
+        return [[[self._vector(word) for word in text.split()[:16] or [""]]] for text in inputs]
+
+    @staticmethod
+    def _vector(word: str):
+        rng = random.Random(zlib.crc32(word.encode()))
+        return [rng.uniform(-1, 1) for _ in range(16)]
+
+
+def create_app():
+    """
+    App factory for uvicorn (--factory): installs the fake pipelines when
+    LOAD_TEST_MODEL_LATENCY_MS is set, then returns the API app.
+    """
+    from main import app
+    from model_registry import registry
+
+    latency = os.environ.get("LOAD_TEST_MODEL_LATENCY_MS")
+    if latency is not None:
+        for name, task in (("summarizer", "summarization"), ("generator", "text-generation"),
+                           ("embedder", "feature-extraction")):
+            registry.set(name, FakePipeline(task, float(latency) / 1000))
+    return app
+
+
+def start_server(port: int, workers: int, model_latency_ms: float, real_models: bool) -> subprocess.Popen:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers))
+    if not real_models:
+        env["LOAD_TEST_MODEL_LATENCY_MS"] = str(model_latency_ms)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "load_test:create_app", "--factory", "--app-dir", BENCHMARKS_DIR,
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"Server exited with code {server.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/")
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("Server did not start within 120s")
+
+
+class Workload:
+    """
+    Builds requests for each operation of the mix against the seeded catalog.
+    """
+
+    def __init__(self, products: int, brands: int, seed: int):
+        self.products = products
+        self.brands = brands
+        self.rng = random.Random(seed)
+        self._signups = 0
+        self._lock = threading.Lock()
+
+    def _name(self, typo_rate: float = 0.2) -> str:
+        name = product_name(self.rng.randrange(self.products))
+        if self.rng.random() < typo_rate:
+            i = self.rng.randrange(len(name))
+            name = name[:i] + self.rng.choice(string.ascii_lowercase) + name[i + 1:]
+        return name
+
+    def request(self, operation: str):
+        """
+        Returns (method, path, JSON body or None) for one `operation`.
+        """
+        if operation == "login":
+            user = f"loadtest-{self.rng.randrange(LOGIN_USERS)}"
+            return "POST", "/login", {"username": user, "password": PASSWORD}
+        if operation == "signup":
+            with self._lock:
+                self._signups += 1
+                user = f"loadtest-new-{os.getpid()}-{time.time_ns()}-{self._signups}"
+            return "POST", "/signup", {"username": user, "password": PASSWORD}
+
+        if operation == "product_details":
+            query = f"give me details of product {self._name()}"
+        elif operation == "fetch_products":
+            query = f"show me all products by brand Brand {self.rng.randrange(self.brands)}"
+        elif operation == "price_filter":
+            query = f"list products {self.rng.choice(['under', 'above'])} ${self.rng.randrange(10, 3000)}"
+        elif operation == "fetch_suppliers":
+            query = f"which suppliers provide {self.rng.choice(CATEGORIES)}"
+        elif operation == "compare_products":
+            names = [self._name() for _ in range(self.rng.randint(2, 4))]
+            query = f"compare {', '.join(names[:-1])} and {names[-1]}"
+        elif operation == "general_query":
+            query = self.rng.choice(QUESTIONS)
+        elif operation == "greeting":
+            query = "hello"
+        else:
+            raise ValueError(f"Unknown operation '{operation}'")
+        return "POST", f"/api/chat?{urlencode({'query': query})}", None
+
+
+def send(connection: http.client.HTTPConnection, method: str, path: str, body) -> int:
+    payload = json.dumps(body) if body is not None else None
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    connection.request(method, path, body=payload, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+
+def create_login_users(port: int):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    for i in range(LOGIN_USERS):
+        status = send(connection, "POST", "/signup", {"username": f"loadtest-{i}", "password": PASSWORD})
+        if status not in (200, 400):  # 400: left over from a --no-seed run
+            raise SystemExit(f"Could not create login users: /signup returned {status}")
+
+
+def run_load(port: int, workload: Workload, mix: dict, concurrency: int, warmup: float, duration: float):
+    """
+    Runs `concurrency` clients for warmup + duration seconds; returns the
+    (operation, status, seconds) samples taken after the warm-up.
+    """
+    operations, weights = list(mix), list(mix.values())
+    samples = []
+    lock = threading.Lock()
+    started = time.monotonic()
+    measure_from, stop_at = started + warmup, started + warmup + duration
+
+    def client(n: int):
+        rng = random.Random(n)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                return
+            operation = rng.choices(operations, weights)[0]
+            method, path, body = workload.request(operation)
+            request_started = time.perf_counter()
+            try:
+                status = send(connection, method, path, body)
+            except (OSError, http.client.HTTPException):
+                status = 0
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+            elapsed = time.perf_counter() - request_started
+            if now >= measure_from:
+                with lock:
+                    samples.append((operation, status, elapsed))
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples: list, duration: float) -> dict:
+    def stats(latencies: list, errors: int) -> dict:
+        latencies = sorted(latencies)
+
+        def percentile(p: float) -> float:
+            return latencies[int(p * (len(latencies) - 1))] * 1000 if latencies else 0.0
+
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "rps": len(latencies) / duration,
+            "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+    operations = sorted({operation for operation, _, _ in samples})
+    results = {
+        operation: stats(
+            [elapsed for op, _, elapsed in samples if op == operation],
+            sum(1 for op, status, _ in samples if op == operation and not 200 <= status < 300),
+        )
+        for operation in operations
+    }
+    results["all"] = stats([elapsed for _, _, elapsed in samples], sum(1 for _, s, _ in samples if not 200 <= s < 300))
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for item in text.split(","):
+        operation, _, weight = item.partition("=")
+        if operation not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown operation '{operation}'; choose from {', '.join(DEFAULT_MIX)}")
+        mix[operation] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API with a mix of chat intents, logins and signups.")
+    parser.add_argument("--products", type=int, default=10_000, help="Synthetic products to seed")
+    parser.add_argument("--brands", type=int, default=50, help="Distinct brands in the synthetic catalog")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the catalog loaded by a previous run")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of load before measuring")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Operation weights, e.g. price_filter=3,login=1 (default: a mix of all of them)")
+    parser.add_argument("--real-models", action="store_true", help="Load the real pipelines instead of fakes")
+    parser.add_argument("--model-latency-ms", type=float, default=20.0, help="Time each fake pipeline call takes")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the catalog and the request stream")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'supplybot_load_test.db')}")
+    if not args.no_seed:
+        seed_database(args.products, args.brands, args.seed)
+
+    server = start_server(args.port, args.workers, args.model_latency_ms, args.real_models)
+    try:
+        create_login_users(args.port)
+        workload = Workload(args.products, args.brands, args.seed)
+        samples = run_load(args.port, workload, args.mix, args.concurrency, args.warmup, args.duration)
+    finally:
+        server.terminate()
+        server.wait()
+
+    results = summarize(samples, args.duration)
+    print(f"{args.products} products, {args.concurrency} clients, {args.workers} workers, {args.duration:.0f}s")
+    print(f"{'operation':<18}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for operation, r in results.items():
+        print(f"{operation:<18}{r['requests']:>10}{r['errors']:>8}{r['rps']:>9.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "timestamp": datetime.utcnow().isoformat(),
+                "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+                "settings": {
+                    "products": args.products,
+                    "concurrency": args.concurrency,
+                    "duration": args.duration,
+                    "workers": args.workers,
+                    "mix": args.mix,
+                    "models": "real" if args.real_models else f"fake ({args.model_latency_ms:g} ms)",
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
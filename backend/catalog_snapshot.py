@@ -0,0 +1,415 @@
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import cached_property
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import func
+
+from config import (
+    CATALOG_SNAPSHOT,
+    CATALOG_SNAPSHOT_INTERVAL,
+    CATALOG_SNAPSHOT_MAX_STALENESS,
+    CATALOG_SNAPSHOT_SUMMARY_INTERVAL,
+)
+from database import SessionLocal
+from metrics import Gauge
+from models import Product
+from pagination import decode_cursor
+
+logger = logging.getLogger(__name__)
+
+# Rows committed up to this long after a later updated_at was seen are still picked up
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+# Ids per query when reading back rows that were summarized since they were loaded
+SUMMARY_RELOAD_BATCH = 1000
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.brand,
+    Product.price,
+    Product.category,
+    Product.description,
+    Product.summary,
+    Product.updated_at,
+    Product.summarized_at,
+)
+
+
+class ProductRow(NamedTuple):
+    """
+    A product served from the snapshot, with the attributes the chat renderers read.
+    """
+    id: int
+    name: str
+    brand: Optional[str]
+    price: Optional[float]
+    category: Optional[str]
+    description: Optional[str]
+    summary: Optional[str]
+    updated_at: Optional[datetime]
+    summarized_at: Optional[datetime]
+
+
+def _micros(value: Optional[datetime]) -> int:
+    return -1 if value is None else (value - EPOCH) // MICROSECOND
+
+
+def _datetime(value: int) -> Optional[datetime]:
+    return None if value < 0 else EPOCH + timedelta(microseconds=int(value))
+
+
+class Dictionary:
+    """
+    Dictionary encoding of a string column: each distinct value gets a
+    stable int code, and NULL is -1. Codes are only ever appended.
+    """
+
+    def __init__(self, values: Optional[List[str]] = None):
+        self.values = list(values or [])
+        self.lowered = [value.lower() for value in self.values]
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def encode(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+            self.lowered.append(value.lower())
+        return code
+
+    def decode(self, code: int) -> Optional[str]:
+        return None if code < 0 else self.values[code]
+
+    def containing(self, term: str) -> List[int]:
+        """
+        Codes of the values containing `term`, ignoring case (like ILIKE '%term%').
+        """
+        term = term.lower()
+        return [code for code, value in enumerate(self.lowered) if term in value]
+
+    def copy(self) -> "Dictionary":
+        return Dictionary(self.values)
+
+
+class Columns:
+    """
+    One immutable build of the snapshot: the products in id order, one numpy
+    array or list per column, plus the orderings the listings need.
+    Refreshes build a new Columns and swap it in, so readers never lock.
+    """
+
+    def __init__(self, ids, prices, brands, brand_codes, categories, category_codes,
+                 names, descriptions, summaries, updated_at, summarized_at):
+        self.ids = ids
+        self.prices = prices  # NaN for NULL
+        self.brands, self.brand_codes = brands, brand_codes
+        self.categories, self.category_codes = categories, category_codes
+        self.names, self.descriptions, self.summaries = names, descriptions, summaries
+        self.updated_at, self.summarized_at = updated_at, summarized_at  # microseconds since the epoch, -1 for NULL
+
+        # Products with a price in (price, id) order, for binary searches on price
+        priced = np.flatnonzero(~np.isnan(prices))
+        self.price_order = priced[np.lexsort((ids[priced], prices[priced]))]
+        self.sorted_prices = prices[self.price_order]
+
+        # Each brand's positions in id order: brand_rows[brand_bounds[c]:brand_bounds[c + 1]]
+        self.brand_rows = np.argsort(brand_codes, kind="stable")
+        self.brand_bounds = np.searchsorted(brand_codes[self.brand_rows], np.arange(len(brands.values) + 1))
+
+    @staticmethod
+    def _encode(rows: list, brands: Dictionary, categories: Dictionary) -> dict:
+        return {
+            "ids": np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+            "prices": np.fromiter((np.nan if row[3] is None else row[3] for row in rows), dtype=np.float64, count=len(rows)),
+            "brand_codes": np.fromiter((brands.encode(row[2]) for row in rows), dtype=np.int32, count=len(rows)),
+            "category_codes": np.fromiter((categories.encode(row[4]) for row in rows), dtype=np.int32, count=len(rows)),
+            "names": [row[1] for row in rows],
+            "descriptions": [row[5] for row in rows],
+            "summaries": [row[6] for row in rows],
+            "updated_at": np.fromiter((_micros(row[7]) for row in rows), dtype=np.int64, count=len(rows)),
+            "summarized_at": np.fromiter((_micros(row[8]) for row in rows), dtype=np.int64, count=len(rows)),
+        }
+
+    @classmethod
+    def build(cls, rows: list) -> "Columns":
+        """
+        Builds the columns from tuples in COLUMNS order, sorted by id.
+        """
+        brands, categories = Dictionary(), Dictionary()
+        return cls(brands=brands, categories=categories, **cls._encode(rows, brands, categories))
+
+    def _columns(self) -> dict:
+        return {name: getattr(self, name) for name in (
+            "ids", "prices", "brand_codes", "category_codes", "names", "descriptions", "summaries",
+            "updated_at", "summarized_at",
+        )}
+
+    @cached_property
+    def nbytes(self) -> int:
+        """
+        Approximate memory held: the arrays plus the Python lists and strings.
+        """
+        arrays = [value for value in self._columns().values() if isinstance(value, np.ndarray)]
+        arrays += [self.price_order, self.sorted_prices, self.brand_rows, self.brand_bounds]
+        lists = [value for value in self._columns().values() if isinstance(value, list)]
+        lists += [self.brands.values, self.categories.values]
+        return sum(array.nbytes for array in arrays) + sum(
+            sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values if value is not None)
+            for values in lists
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, position: int) -> ProductRow:
+        price = self.prices[position]
+        return ProductRow(
+            id=int(self.ids[position]),
+            name=self.names[position],
+            brand=self.brands.decode(int(self.brand_codes[position])),
+            price=None if np.isnan(price) else float(price),
+            category=self.categories.decode(int(self.category_codes[position])),
+            description=self.descriptions[position],
+            summary=self.summaries[position],
+            updated_at=_datetime(self.updated_at[position]),
+            summarized_at=_datetime(self.summarized_at[position]),
+        )
+
+    def changed(self, rows: list) -> list:
+        """
+        The rows that are new or whose updated_at differs from the stored one.
+        """
+        positions = np.searchsorted(self.ids, [row[0] for row in rows])
+        return [
+            row for row, position in zip(rows, positions)
+            if position >= len(self.ids) or self.ids[position] != row[0] or self.updated_at[position] != _micros(row[7])
+        ]
+
+    def resummarized(self, stamps: list) -> List[int]:
+        """
+        The stored ids among (id, summarized_at) pairs whose summarized_at
+        differs from the stored one.
+        """
+        if not len(self.ids):
+            return []
+        positions = np.minimum(np.searchsorted(self.ids, [row[0] for row in stamps]), len(self.ids) - 1)
+        return [
+            row[0] for row, position in zip(stamps, positions)
+            if self.ids[position] == row[0] and self.summarized_at[position] != _micros(row[1])
+        ]
+
+    def merge(self, rows: list, keep_ids: Optional[np.ndarray] = None) -> "Columns":
+        """
+        Returns new columns with `rows` replacing the stored versions of their
+        ids or added, restricted to `keep_ids` if given. Columns are patched
+        as arrays; only the orderings are rebuilt.
+        """
+        brands, categories = self.brands.copy(), self.categories.copy()
+        changes = self._encode(rows, brands, categories)
+        positions = np.searchsorted(self.ids, changes["ids"])
+        exists = (positions < len(self.ids)) & (self.ids[np.minimum(positions, len(self.ids) - 1)] == changes["ids"])
+        existing, added = np.flatnonzero(exists), np.flatnonzero(~exists)
+
+        columns = {}
+        for name, values in self._columns().items():
+            new = changes[name]
+            if isinstance(values, np.ndarray):
+                values = values.copy()
+                values[positions[existing]] = new[existing]
+                values = np.concatenate([values, new[added]])
+            else:
+                values = list(values)
+                for i in existing:
+                    values[positions[i]] = new[i]
+                values.extend(new[i] for i in added)
+            columns[name] = values
+
+        if keep_ids is not None:
+            keep = np.isin(columns["ids"], keep_ids)
+            columns = {
+                name: values[keep] if isinstance(values, np.ndarray) else [v for v, k in zip(values, keep) if k]
+                for name, values in columns.items()
+            }
+        if len(added) and len(self.ids) and changes["ids"][added].min() < self.ids[-1]:
+            # Ids added below the current maximum: restore id order
+            order = np.argsort(columns["ids"], kind="stable")
+            columns = {
+                name: values[order] if isinstance(values, np.ndarray) else [values[i] for i in order]
+                for name, values in columns.items()
+            }
+        return Columns(brands=brands, categories=categories, **columns)
+
+    def by_brand(self, term: str, cursor: Optional[str], size: int) -> List[ProductRow]:
+        """
+        Same page as chatbot.products_by_brand: products whose brand contains `term`, in id order.
+        """
+        slices = [self.brand_rows[self.brand_bounds[c]:self.brand_bounds[c + 1]] for c in self.brands.containing(term)]
+        if not slices:
+            return []
+        positions = np.sort(np.concatenate(slices)) if len(slices) > 1 else slices[0]
+        if cursor:
+            (last_id,) = decode_cursor(cursor, (int,))
+            positions = positions[np.searchsorted(self.ids[positions], last_id, side="right"):]
+        return [self.row(position) for position in positions[:size + 1]]
+
+    def by_price(self, filter_type: str, price: float, cursor: Optional[str], size: int) -> List[ProductRow]:
+        """
+        Same page as chatbot.products_by_price: products under/above `price` in (price, id) order.
+        """
+        if filter_type == "under":
+            start, end = 0, int(np.searchsorted(self.sorted_prices, price, side="right"))
+        else:
+            start, end = int(np.searchsorted(self.sorted_prices, price, side="left")), len(self.sorted_prices)
+        if cursor:
+            last_price, last_id = decode_cursor(cursor, (float, int))
+            # First (price, id) after the cursor: skip lower prices, then ties up to last_id
+            ties_start = int(np.searchsorted(self.sorted_prices, last_price, side="left"))
+            ties_end = int(np.searchsorted(self.sorted_prices, last_price, side="right"))
+            tie_ids = self.ids[self.price_order[ties_start:ties_end]]
+            start = max(start, ties_start + int(np.searchsorted(tie_ids, last_id, side="right")))
+        return [self.row(position) for position in self.price_order[start:min(end, start + size + 1)]]
+
+
+class CatalogSnapshot:
+    """
+    Read-through copy of the products table for brand and price listings.
+    A background thread loads it once, then polls for rows whose updated_at
+    is past the watermark and checks the row count to notice deletes.
+    Lookups use it only while it is fresh; otherwise callers query the database.
+    summarize_catalog.py stores summaries without moving updated_at, so every
+    summary_interval seconds the snapshot compares each product's
+    summarized_at with its own and reloads the rows that differ; until then
+    those rows are summarized through the summary cache like any other.
+    """
+
+    def __init__(
+        self,
+        interval: float = CATALOG_SNAPSHOT_INTERVAL,
+        max_staleness: float = CATALOG_SNAPSHOT_MAX_STALENESS,
+        summary_interval: float = CATALOG_SNAPSHOT_SUMMARY_INTERVAL,
+    ):
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.summary_interval = summary_interval
+        self.columns: Optional[Columns] = None
+        self.watermark: Optional[datetime] = None
+        self.refreshed_at: Optional[float] = None
+        self.summaries_checked_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        Starts the refresh thread; the snapshot serves lookups after its first load.
+        """
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Error refreshing catalog snapshot: {e}")
+                time.sleep(self.interval)
+
+        self._thread = threading.Thread(target=run, name="catalog-snapshot", daemon=True)
+        self._thread.start()
+
+    def refresh(self):
+        db = SessionLocal()
+        try:
+            columns = self.columns
+            if columns is None:
+                rows = db.query(*COLUMNS).order_by(Product.id).all()
+                columns = Columns.build([tuple(row) for row in rows])
+                self.summaries_checked_at = time.monotonic()
+                logger.info(f"Loaded catalog snapshot: {len(columns)} products, {columns.nbytes / 2**20:.1f} MiB")
+            else:
+                query = db.query(*COLUMNS)
+                if self.watermark is not None:
+                    query = query.filter(Product.updated_at >= self.watermark - WATERMARK_OVERLAP)
+                rows = columns.changed([tuple(row) for row in query])
+                if time.monotonic() - self.summaries_checked_at >= self.summary_interval:
+                    rows += self._resummarized(db, columns)
+                    self.summaries_checked_at = time.monotonic()
+                count = db.query(func.count(Product.id)).scalar()
+                if rows or count != len(columns):
+                    columns = columns.merge(rows)
+                    if len(columns) != count:
+                        # Deletes leave no updated_at behind; keep only the ids that still exist
+                        ids = np.fromiter((id_ for id_, in db.query(Product.id)), dtype=np.int64)
+                        columns = columns.merge([], keep_ids=ids)
+
+            if len(columns) and columns.updated_at.max() >= 0:
+                self.watermark = _datetime(int(columns.updated_at.max()))
+            self.columns = columns
+            self.refreshed_at = time.monotonic()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _resummarized(db, columns: Columns) -> list:
+        # Rows whose summary was stored since they were loaded, read back in batches of ids
+        stamps = db.query(Product.id, Product.summarized_at).filter(Product.summarized_at.isnot(None))
+        ids = columns.resummarized([tuple(row) for row in stamps])
+        return [
+            tuple(row)
+            for start in range(0, len(ids), SUMMARY_RELOAD_BATCH)
+            for row in db.query(*COLUMNS).filter(Product.id.in_(ids[start:start + SUMMARY_RELOAD_BATCH]))
+        ]
+
+    def staleness(self) -> Optional[float]:
+        """
+        Seconds since the last successful refresh, or None before the first load.
+        """
+        return None if self.refreshed_at is None else time.monotonic() - self.refreshed_at
+
+    def ready(self) -> bool:
+        staleness = self.staleness()
+        return staleness is not None and staleness <= self.max_staleness
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Row count, approximate memory footprint and staleness; empty before the first load.
+        """
+        columns = self.columns
+        if columns is None:
+            return {}
+        return {"rows": len(columns), "bytes": columns.nbytes, "staleness_seconds": self.staleness()}
+
+    def products_by_brand(self, brand: str, cursor: Optional[str], size: int) -> List[ProductRow]:
+        return self.columns.by_brand(brand, cursor, size)
+
+    def products_by_price(self, filter_type: str, price: float, cursor: Optional[str], size: int) -> List[ProductRow]:
+        return self.columns.by_price(filter_type, price, cursor, size)
+
+
+catalog_snapshot = CatalogSnapshot() if CATALOG_SNAPSHOT else None
+
+
+def _stat_reading(name: str):
+    def read():
+        stats = catalog_snapshot.stats()
+        return {(): stats[name]} if stats else {}
+    return read
+
+
+if catalog_snapshot is not None:
+    Gauge("catalog_snapshot_rows", "Products held by the catalog snapshot", _stat_reading("rows"))
+    Gauge("catalog_snapshot_bytes", "Approximate memory held by the catalog snapshot", _stat_reading("bytes"))
+    Gauge(
+        "catalog_snapshot_staleness_seconds",
+        "Seconds since the catalog snapshot last refreshed",
+        _stat_reading("staleness_seconds"),
+    )
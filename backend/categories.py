@@ -0,0 +1,87 @@
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import insert, or_, select
+from sqlalchemy.orm import Session
+
+from models import Category, Supplier, supplier_categories
+
+
+def normalize_category(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def split_categories(categories_offered: Optional[str]) -> List[str]:
+    """
+    Splits a comma-joined `product_categories_offered` string into normalized category names.
+    """
+    if not categories_offered:
+        return []
+    names = (normalize_category(part) for part in categories_offered.split(","))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def category_ids(db: Session, names: Iterable[str], known: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """
+    Returns the ids of the categories `names`, creating the missing ones.
+    `known` is an optional name -> id cache shared across calls.
+    """
+    known = {} if known is None else known
+    missing = [name for name in names if name not in known]
+    if missing:
+        for category in db.query(Category).filter(Category.name.in_(missing)):
+            known[category.name] = category.id
+        for name in missing:
+            if name not in known:
+                category = Category(name=name)
+                db.add(category)
+                db.flush()
+                known[name] = category.id
+    return known
+
+
+def sync_supplier_categories(db: Session, suppliers: List[Supplier], known: Optional[Dict[str, int]] = None):
+    """
+    Makes the supplier_categories rows of `suppliers` match their product_categories_offered strings.
+    """
+    if not suppliers:
+        return
+    wanted = {s.id: split_categories(s.product_categories_offered) for s in suppliers}
+    ids = category_ids(db, {name for names in wanted.values() for name in names}, known)
+
+    db.execute(supplier_categories.delete().where(supplier_categories.c.supplier_id.in_(list(wanted))))
+    rows = [
+        {"supplier_id": supplier_id, "category_id": ids[name]}
+        for supplier_id, names in wanted.items()
+        for name in names
+    ]
+    if rows:
+        db.execute(insert(supplier_categories), rows)
+
+
+def resolve_categories(db: Session, term: str) -> List[int]:
+    """
+    Resolves a category from a query to category ids: an exact match (also
+    trying the singular form), otherwise categories with a word that starts
+    with the term, so "laptop" finds "laptops" and "appliances" finds
+    "home appliances" without "phone" matching "smartphones".
+    """
+    term = normalize_category(term)
+    candidates = {term, term[:-1]} if term.endswith("s") else {term}
+    ids = [row.id for row in db.query(Category.id).filter(Category.name.in_(candidates))]
+    if not ids:
+        # Category names are normalized, so words are separated by single spaces
+        stem = min(candidates, key=len)
+        ids = [
+            row.id for row in db.query(Category.id).filter(
+                or_(Category.name.like(f"{stem}%"), Category.name.like(f"% {stem}%"))
+            )
+        ]
+    return ids
+
+
+def suppliers_in_categories(category_ids: List[int]):
+    """
+    Subquery of the ids of suppliers offering any of `category_ids`, served by
+    the (category_id, supplier_id) index.
+    """
+    return select(supplier_categories.c.supplier_id).where(supplier_categories.c.category_id.in_(category_ids))
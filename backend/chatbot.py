@@ -1,12 +1,39 @@
-import re
+import asyncio
+import contextvars
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from dataclasses import dataclass, field
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Integer, column, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from transformers import pipeline
-from typing import Dict, Any
-
-from database import SessionLocal
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
+
+import inference
+from config import (
+    SUMMARY_BATCH_SIZE,
+    MODEL_WAIT_FOR_LOAD,
+    DISCONNECT_POLL_INTERVAL,
+    STREAM_CHUNK_SIZE,
+    CHAT_BATCH_MAX_QUERIES,
+    COMPARE_MAX_PRODUCTS,
+    SEMANTIC_GENERATE_ANSWER,
+)
+from database import SessionLocal, get_async_db
+from inference import inference_executor
+from pagination import page_size, keyset_page, split_page, encode_cursor
+from search import search, contains
+from categories import resolve_categories, suppliers_in_categories
+from catalog_snapshot import catalog_snapshot
+from intent_router import intent_router
+from metrics import Counter, span
 from models import Product, Supplier
+from name_index import name_index
+from summary_cache import summary_cache
+from response_cache import response_cache
+from semantic_index import nearest_many, similar_rows_many
 
 router = APIRouter()
 
@@ -14,11 +41,14 @@ router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize the summarization pipeline with DistilBART
-summarizer = pipeline("summarization", model="sshleifer/distilbart-cnn-12-6")
+# Returned in place of model output when inference fails
+FALLBACK_RESPONSE = "I'm sorry, I couldn't process your request."
+UNCLEAR_RESPONSE = "I'm sorry, I couldn't understand your request. Could you clarify further?"
 
-# Initialize the text-generation pipeline with DistilGPT2
-generator = pipeline("text-generation", model="distilgpt2")
+CHAT_QUERIES = Counter("chat_queries_total", "Parsed chat queries by intent", ["intent"])
+SUMMARY_SOURCES = Counter(
+    "chat_summaries_total", "Summaries served, by where they came from (stored, cache or model)", ["source"]
+)
 
 
 def get_db():
@@ -38,47 +68,73 @@ def parse_query(query: str) -> Dict[str, Any]:
     Parses the user's query to determine the intent and extract relevant entities.
     Returns a dictionary containing the intent and extracted entities.
     """
-    query_lower = query.lower().strip()
-    intent = None
-    entities = {}
-
-    # Define regex patterns for different intents
-    patterns = {
-        "greeting": r"^(hello|hi|hey|greetings)\.?$",
-        "price_filter": r"^(show me|list)\s+products\s+(under|above)\s+\$?(\d+\.?\d*)\.?$",
-        "compare_products": r"^compare\s+([\w\s]+)\s+with\s+([\w\s]+)\.?$",
-        "fetch_products": r"^(show me|list|display)\s+(all\s+)?products\s+(by|for|under)\s+brand\s+([\w\s]+)\.?$",
-        "fetch_suppliers": r"^(which|what|list|tell me about)\s+suppliers\s+(that\s+)?(provide|offer)\s+([\w\s]+)\.?$",
-        "product_details": r"^(give me|provide|show)\s+details\s+(of|about|for)\s+product\s+([\w\s]+)\.?$",
-        "general_query": r".*"  # Catch-all for general queries
-    }
+    parsed = intent_router.route(query)
+    CHAT_QUERIES.inc(intent=parsed["intent"])
+    logger.info("Parsed query %r as intent %r with entities %s", query, parsed["intent"], parsed["entities"])
+    return parsed
 
-    for key, pattern in patterns.items():
-        match = re.match(pattern, query_lower)
-        if match:
-            intent = key
-            if key == "greeting":
-                pass
-            elif key == "price_filter":
-                entities["filter_type"] = match.group(2).strip()
-                entities["price"] = float(match.group(3).strip())
-            elif key == "compare_products":
-                entities["product_a"] = match.group(1).strip()
-                entities["product_b"] = match.group(2).strip()
-            elif key == "fetch_products":
-                entities["brand"] = match.group(4).strip()
-            elif key == "fetch_suppliers":
-                entities["category"] = match.group(4).strip()
-            elif key == "product_details":
-                entities["product_name"] = match.group(4).strip()
-            break
-
-    if not intent:
-        intent = "general_query"
-        entities["question"] = query.strip()
-
-    logger.info(f"Parsed query '{query}' as intent '{intent}' with entities {entities}")
-    return {"intent": intent, "entities": entities}
+
+def summarize_many(
+    texts: List[Optional[str]],
+    batch_size: int = SUMMARY_BATCH_SIZE,
+    wait: bool = MODEL_WAIT_FOR_LOAD,
+) -> Tuple[List[Optional[str]], bool]:
+    """
+    Summarizes a list of texts and returns the summaries in the same order,
+    and whether any of them is degraded: left unsummarized because the
+    summarizer was unavailable (still loading with wait=False, or the shared
+    worker didn't answer) or replaced by FALLBACK_RESPONSE because it failed.
+    Short and already cached texts are answered directly; the remaining ones are
+    deduplicated and sent to the summarizer as padded batches of `batch_size`.
+    """
+    results = list(texts)
+    pending: Dict[str, List[int]] = {}
+
+    with span("summary_cache"):
+        # Missing and short texts are returned as they are
+        wanted = [text for text in texts if text and len(text.split()) >= 10]
+        cached = summary_cache.get_many(wanted) if wanted else {}
+        for index, text in enumerate(texts):
+            if not text or len(text.split()) < 10:
+                continue
+            if text in cached:
+                results[index] = cached[text]
+                SUMMARY_SOURCES.inc(source="cache")
+            else:
+                pending.setdefault(text, []).append(index)
+
+    if not pending:
+        return results, False
+
+    misses = list(pending)
+    SUMMARY_SOURCES.inc(len(misses), source="model")
+    summaries = inference.summarize(misses, batch_size=batch_size, wait=wait)
+    if summaries is None:
+        logger.info("Summarizer is unavailable; returning unsummarized text.")
+        return results, True
+
+    for text, summary in zip(misses, summaries):
+        for index in pending[text]:
+            results[index] = FALLBACK_RESPONSE if summary is None else summary
+    summary_cache.set_many({text: summary for text, summary in zip(misses, summaries) if summary is not None})
+
+    return results, None in summaries
+
+
+def generate_responses(texts: List[str]) -> List[str]:
+    """
+    Has the generator answer each text as one exchange of a chat, in a single call.
+    """
+    responses = inference.generate([f"User: {text}\nBot:" for text in texts]) or [None] * len(texts)
+    results = []
+    for response in responses:
+        if response is None:
+            results.append(FALLBACK_RESPONSE)
+        elif "Bot:" in response:
+            results.append(response.split("Bot:")[1].strip())
+        else:
+            results.append(response)
+    return results
 
 
 def enhance_response(text: str, mode: str = "summarize") -> str:
@@ -88,176 +144,866 @@ def enhance_response(text: str, mode: str = "summarize") -> str:
     """
     try:
         if mode == "summarize":
-            input_length = len(text.split())
-            if input_length < 10:
-                return text  # If text is too short, return it as is
-            
-            # Dynamically set max_length and min_length based on input length
-            max_length = min(100, int(input_length * 1.5))  # 1.5 times input length
-            min_length = min(30, input_length)  # Ensure min_length does not exceed input length
-
-            enhanced = summarizer(text, max_length=max_length, min_length=min_length, do_sample=False)
-            return enhanced[0]["summary_text"].strip()
+            summaries, _ = summarize_many([text])
+            return summaries[0]
 
         elif mode == "generate":
-            prompt = f"User: {text}\nBot:"
-            enhanced = generator(prompt, max_length=150, num_return_sequences=1, do_sample=False)
-            response = enhanced[0]["generated_text"].strip()
-            if "Bot:" in response:
-                return response.split("Bot:")[1].strip()
-            return response
+            return generate_responses([text])[0]
 
         elif mode == "greeting":
             return "Hello! How can I assist you today?"
 
     except Exception as e:
         logger.error(f"Error in enhance_response: {e}")
-        return "I'm sorry, I couldn't process your request."
+        return FALLBACK_RESPONSE
 
 
-@router.post("/chat")
-def handle_chat(query: str, db: Session = Depends(get_db)):
+def row_text(row) -> Optional[str]:
     """
-    Main endpoint to handle chatbot queries.
+    The text summarized for a product or supplier row.
+    """
+    return row.description if isinstance(row, Product) else supplier_profile(row)
+
+
+def grounded_prompt(question: str, rows: list) -> str:
+    """
+    The question with the catalog entries it matched, kept short enough for the generator's context.
+    """
+    entries = "; ".join(
+        f"{row.name} ({row.brand}, ${row.price})" if isinstance(row, Product) else f"supplier {row.name}"
+        for row in rows[:3]
+    )
+    return f"Catalog: {entries}. {question}"
+
+
+def supplier_profile(supplier: Supplier) -> str:
+    """
+    Builds the text that is summarized for a supplier.
+    """
+    return (
+        f"Supplier Name: {supplier.name}\nContact Info: {supplier.contact_info}\n"
+        f"Categories Offered: {supplier.product_categories_offered}"
+    )
+
+
+def stored_summary(row) -> Optional[str]:
+    """
+    Returns the summary precomputed by summarize_catalog.py if it is still
+    current for the row, or None when the row changed since it was computed.
+    """
+    if row.summary is not None and row.summarized_at is not None and row.summarized_at == row.updated_at:
+        return row.summary
+    return None
+
+
+def summarize_rows(rows: list, texts: List[Optional[str]]) -> Tuple[List[Optional[str]], bool]:
+    """
+    Returns a summary per row, preferring stored summaries and summarizing
+    only the rows that don't have a current one yet, and whether any
+    summary is degraded (see summarize_many).
+    """
+    summaries = [stored_summary(row) for row in rows]
+    missing = [i for i, summary in enumerate(summaries) if summary is None]
+    if len(missing) < len(rows):
+        SUMMARY_SOURCES.inc(len(rows) - len(missing), source="stored")
+    if not missing:
+        return summaries, False
+    fresh, degraded = summarize_many([texts[i] for i in missing])
+    for i, summary in zip(missing, fresh):
+        summaries[i] = summary
+    return summaries, degraded
+
+
+@dataclass
+class ChatPlan:
+    """
+    What a parsed query resolved to: either a final `response`, or the rows it
+    matched together with the texts to summarize and how to render the result.
+    """
+    response: Any = None
+    rows: list = field(default_factory=list)
+    texts: List[Optional[str]] = field(default_factory=list)
+    render: Optional[Callable[[list, List[Optional[str]]], Any]] = None
+    paginated: bool = False
+    next_cursor: Optional[str] = None
+    # Generator prompt for a free-text answer, and the answer once generated
+    prompt: Optional[str] = None
+    answer: Optional[str] = None
+    # Set when a model was unavailable or failed, so the response is not final and must not be cached
+    degraded: bool = False
+
+    def finish(self, summaries: List[Optional[str]]) -> Any:
+        if self.render is None:
+            return self.response
+        return self.render(self.rows, summaries)
+
+    def body(self, summaries: List[Optional[str]]) -> Dict[str, Any]:
+        """
+        Builds the endpoint's JSON body; listings also carry the cursor of their next page.
+        """
+        body = {"response": self.finish(summaries)}
+        if self.paginated:
+            body["next_cursor"] = self.next_cursor
+        if self.prompt is not None:
+            body["answer"] = self.answer
+        return body
+
+
+def complete_plan(plan: ChatPlan) -> List[Optional[str]]:
+    """
+    Runs the model work a plan needs: its answer, if it asks for one, and
+    a summary per row. Returns the summaries and marks the plan degraded if
+    any of them or the answer is.
+    """
+    if plan.prompt is not None:
+        plan.answer = generate_responses([plan.prompt])[0]
+        plan.degraded |= plan.answer == FALLBACK_RESPONSE
+    summaries, degraded = summarize_rows(plan.rows, plan.texts)
+    plan.degraded |= degraded
+    return summaries
+
+
+def render_product_details(rows: List[Product], summaries: List[Optional[str]]) -> Dict[str, Any]:
+    product = rows[0]
+    return {
+        "id": product.id,
+        "name": product.name,
+        "brand": product.brand,
+        "price": product.price,
+        "category": product.category,
+        "description": summaries[0],
+    }
+
+
+def render_product_rows(rows: List[Product], summaries: List[Optional[str]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": p.id,
+            "name": p.name,
+            "brand": p.brand,
+            "price": p.price,
+            "category": p.category,
+            "description": description,
+        }
+        for p, description in zip(rows, summaries)
+    ]
+
+
+def render_supplier_rows(rows: List[Supplier], summaries: List[Optional[str]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": s.id,
+            "name": s.name,
+            "contact_info": s.contact_info,
+            "product_categories_offered": s.product_categories_offered,
+            "summary": summary,
+        }
+        for s, summary in zip(rows, summaries)
+    ]
+
+
+def render_matches(rows: list, summaries: List[Optional[str]]) -> List[Dict[str, Any]]:
+    """
+    Products and suppliers in one table, so every row has the same columns.
+    """
+    return [
+        {
+            "type": "product" if isinstance(row, Product) else "supplier",
+            "id": row.id,
+            "name": row.name,
+            "details": (
+                f"{row.brand}, {row.category}, ${row.price}" if isinstance(row, Product)
+                else f"{row.product_categories_offered}; {row.contact_info}"
+            ),
+            "summary": summary,
+        }
+        for row, summary in zip(rows, summaries)
+    ]
+
+
+def render_comparison(rows: List[Product], summaries: List[Optional[str]]) -> Dict[str, Any]:
+    """
+    A table with one column per product and one row per feature, each row's values in column order.
+    """
+    features = [
+        ("Brand", [p.brand for p in rows]),
+        ("Price", [p.price for p in rows]),
+        ("Category", [p.category for p in rows]),
+        ("Description", summaries),
+    ]
+    return {
+        "columns": [p.name for p in rows],
+        "rows": [{"feature": feature, "values": list(values)} for feature, values in features],
+    }
+
+
+def id_key(row) -> list:
+    return [row.id]
+
+
+def price_key(product: Product) -> list:
+    return [product.price, product.id]
+
+
+def products_by_brand(db: Session, brand: str, cursor: Optional[str], size: int):
+    """
+    One page of a brand's products in id order.
+    """
+    query = db.query(Product).filter(contains(Product.brand, brand))
+    return keyset_page(query, [Product.id], cursor, size)
+
+
+def products_by_price(db: Session, filter_type: str, price: float, cursor: Optional[str], size: int):
+    """
+    One page of products under/above a price in (price, id) order.
+    """
+    query = db.query(Product).filter(
+        Product.price <= price if filter_type == "under" else Product.price >= price
+    )
+    return keyset_page(query, [Product.price, Product.id], cursor, size)
+
+
+def suppliers_by_category(db: Session, category_ids: List[int], cursor: Optional[str], size: int):
+    """
+    One page of the suppliers offering any of `category_ids` in id order.
+    """
+    query = db.query(Supplier).filter(Supplier.id.in_(suppliers_in_categories(category_ids)))
+    return keyset_page(query, [Supplier.id], cursor, size)
+
+
+def snapshot_ready() -> bool:
+    return catalog_snapshot is not None and catalog_snapshot.ready()
+
+
+def name_index_ready() -> bool:
+    return name_index is not None and name_index.loaded
+
+
+def products_named(db: Session, names: List[str]) -> Dict[str, Optional[Product]]:
+    """
+    Resolves product names in one round trip: names the name index matches
+    confidently are fetched by id and the rest by substring search, all in
+    one UNION ALL statement.
+    """
+    matched: Dict[str, int] = {}
+    if name_index_ready():
+        for name in names:
+            hits = name_index.lookup(name, limit=1)
+            if hits:
+                matched[name] = hits[0][0]
+
+    queries = {
+        ("name", name): search(db.query(Product), Product.name, name).limit(1) for name in names if name not in matched
+    }
+    if matched:
+        queries[("ids",)] = db.query(Product).filter(Product.id.in_(set(matched.values())))
+    results = union_rows(db, Product, queries) if queries else {}
+    by_id = {product.id: product for product in results.get(("ids",), [])}
+
+    found: Dict[str, Optional[Product]] = {}
+    for name in names:
+        if name in matched:
+            # An id deleted since the index last refreshed falls back to the substring search
+            found[name] = by_id.get(matched[name]) or search(db.query(Product), Product.name, name).first()
+        else:
+            rows = results[("name", name)]
+            found[name] = rows[0] if rows else None
+    return found
+
+
+class Lookups:
+    """
+    The database lookups plan_chat makes, each returning fetched rows.
+    Brand and price listings come from the catalog snapshot while it is
+    fresh; `from_snapshot` records whether any did. `hits` holds semantic
+    index results computed before the lookups (see nearest_many);
+    `degraded` records whether a question could not be searched.
+    """
+
+    def __init__(self, db: Session, hits: Optional[Dict[str, list]] = None):
+        self.db = db
+        self.hits = hits
+        self.from_snapshot = False
+        self.degraded = False
+
+    def products_named(self, names: List[str]) -> Dict[str, Optional[Product]]:
+        """
+        The closest match for each name in the name index, which tolerates
+        typos; names it has no confident match for fall back to a substring search.
+        """
+        return products_named(self.db, names)
+
+    def product_named(self, name: str) -> Optional[Product]:
+        return self.products_named([name])[name]
+
+    def products_by_brand(self, brand: str, cursor: Optional[str], size: int) -> List[Product]:
+        if snapshot_ready():
+            self.from_snapshot = True
+            return catalog_snapshot.products_by_brand(brand, cursor, size)
+        return products_by_brand(self.db, brand, cursor, size).all()
+
+    def products_by_price(self, filter_type: str, price: float, cursor: Optional[str], size: int) -> List[Product]:
+        if snapshot_ready():
+            self.from_snapshot = True
+            return catalog_snapshot.products_by_price(filter_type, price, cursor, size)
+        return products_by_price(self.db, filter_type, price, cursor, size).all()
+
+    def category_ids(self, category: str) -> List[int]:
+        return resolve_categories(self.db, category)
+
+    def suppliers_by_category(self, category_ids: List[int], cursor: Optional[str], size: int) -> List[Supplier]:
+        return suppliers_by_category(self.db, category_ids, cursor, size).all()
+
+    def similar(self, question: str) -> list:
+        matches = similar_rows_many(self.db, [question], hits=self.hits)[question]
+        if matches is None:
+            self.degraded = True
+            return []
+        return [row for row, _ in matches]
+
+
+# Subqueries per UNION ALL statement; SQLite caps compound selects at 500
+UNION_CHUNK_SIZE = 100
+
+
+def union_rows(db: Session, model, queries: Dict[Any, Any]) -> Dict[Any, list]:
+    """
+    Runs several ORM queries over `model` as UNION ALL statements and returns
+    the rows of each query under its key. Row order within a query is not
+    kept; callers sort by their keyset key.
+    """
+    results: Dict[Any, list] = {key: [] for key in queries}
+    items = list(queries.items())
+    for start in range(0, len(items), UNION_CHUNK_SIZE):
+        chunk = items[start:start + UNION_CHUNK_SIZE]
+        parts = [
+            select(query.statement.add_columns(literal(i).label("batch_key")).subquery())
+            for i, (_, query) in enumerate(chunk)
+        ]
+        statement = select(model, column("batch_key", Integer)).from_statement(union_all(*parts))
+        for row, i in db.execute(statement):
+            results[chunk[i][0]].append(row)
+    return results
+
+
+class BatchLookups(Lookups):
+    """
+    Lookups for many parsed queries at once: the first pages and product
+    names every query needs are fetched up front with one UNION ALL
+    statement per intent, and plan_chat is then answered from those results.
+    """
+
+    def __init__(self, db: Session, parsed_queries: List[Dict[str, Any]], size: int):
+        super().__init__(db)
+        self.size = size
+        names, brands, prices, categories, questions = set(), set(), set(), set(), set()
+        for parsed in parsed_queries:
+            intent, entities = parsed["intent"], parsed["entities"]
+            if intent == "product_details" and entities.get("product_name"):
+                names.add(entities["product_name"])
+            elif intent == "compare_products" and 2 <= len(entities.get("products") or ()) <= COMPARE_MAX_PRODUCTS:
+                names.update(entities["products"])
+            elif intent == "fetch_products" and entities.get("brand"):
+                brands.add(entities["brand"])
+            elif intent == "price_filter" and entities.get("filter_type") and entities.get("price") is not None:
+                prices.add((entities["filter_type"], entities["price"]))
+            elif intent == "fetch_suppliers" and entities.get("category"):
+                categories.add(entities["category"])
+            elif intent == "general_query" and entities.get("question"):
+                questions.add(entities["question"])
+
+        self._products = products_named(db, list(names))
+
+        # Listings the catalog snapshot answers are left to it
+        if snapshot_ready():
+            brands, prices = set(), set()
+        pages = union_rows(db, Product, {brand: products_by_brand(db, brand, None, size) for brand in brands})
+        self._brands = {brand: sorted(rows, key=id_key) for brand, rows in pages.items()}
+
+        pages = union_rows(db, Product, {key: products_by_price(db, *key, None, size) for key in prices})
+        self._prices = {key: sorted(rows, key=price_key) for key, rows in pages.items()}
+
+        # Category names resolve against the small categories table; the supplier pages are batched
+        self._categories = {category: resolve_categories(db, category) for category in categories}
+        wanted = {tuple(ids) for ids in self._categories.values() if ids}
+        pages = union_rows(db, Supplier, {ids: suppliers_by_category(db, list(ids), None, size) for ids in wanted})
+        self._suppliers = {ids: sorted(rows, key=id_key) for ids, rows in pages.items()}
+
+        # Every question is embedded in one model call
+        matches = similar_rows_many(db, list(questions)) if questions else {}
+        self._similar = {question: [row for row, _ in rows or ()] for question, rows in matches.items()}
+
+    def products_named(self, names: List[str]) -> Dict[str, Optional[Product]]:
+        missing = [name for name in names if name not in self._products]
+        found = super().products_named(missing) if missing else {}
+        return {name: self._products[name] if name in self._products else found[name] for name in names}
+
+    def products_by_brand(self, brand: str, cursor: Optional[str], size: int) -> List[Product]:
+        if cursor is None and size == self.size and brand in self._brands:
+            return self._brands[brand]
+        return super().products_by_brand(brand, cursor, size)
+
+    def products_by_price(self, filter_type: str, price: float, cursor: Optional[str], size: int) -> List[Product]:
+        key = (filter_type, price)
+        if cursor is None and size == self.size and key in self._prices:
+            return self._prices[key]
+        return super().products_by_price(filter_type, price, cursor, size)
+
+    def category_ids(self, category: str) -> List[int]:
+        if category in self._categories:
+            return self._categories[category]
+        return super().category_ids(category)
+
+    def suppliers_by_category(self, category_ids: List[int], cursor: Optional[str], size: int) -> List[Supplier]:
+        key = tuple(category_ids)
+        if cursor is None and size == self.size and key in self._suppliers:
+            return self._suppliers[key]
+        return super().suppliers_by_category(category_ids, cursor, size)
+
+    def similar(self, question: str) -> list:
+        if question in self._similar:
+            return self._similar[question]
+        return super().similar(question)
+
+
+def plan_chat(
+    db: Session,
+    parsed: Dict[str, Any],
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    lookups: Optional[Lookups] = None,
+    hits: Optional[Dict[str, list]] = None,
+) -> ChatPlan:
+    """
+    Runs the database lookups for a parsed query.
+    Listings return one page of at most `limit` rows after `cursor`.
+    Only takes a plain Session so the async endpoint can run it through
+    AsyncSession.run_sync; summarization is left to the caller, and so can
+    the embedding of a general question, passed in as nearest_many `hits`.
     """
-    parsed = parse_query(query)
     intent = parsed.get("intent")
     entities = parsed.get("entities")
+    size = page_size(limit)
+    lookups = lookups or Lookups(db, hits)
+
+    if intent == "greeting":
+        return ChatPlan(response=enhance_response("", mode="greeting"))
+
+    elif intent == "product_details":
+        product_name = entities.get("product_name")
+        if not product_name:
+            return ChatPlan(response="Please specify the product name to fetch details.")
+
+        product = lookups.product_named(product_name)
+        if not product:
+            logger.info(f"Product '{product_name}' not found.")
+            return ChatPlan(response=f"No product found with name '{product_name}'.")
+
+        return ChatPlan(rows=[product], texts=[product.description], render=render_product_details)
+
+    elif intent == "fetch_products":
+        brand = entities.get("brand")
+        if not brand:
+            return ChatPlan(response="Please specify a brand to fetch products.")
+
+        products, next_cursor = split_page(lookups.products_by_brand(brand, cursor, size), size, id_key)
+        if not products:
+            logger.info(f"No products found under brand '{brand}'.")
+            return ChatPlan(response=f"No products found for brand '{brand}'.")
+
+        return ChatPlan(
+            rows=products,
+            texts=[p.description for p in products],
+            render=render_product_rows,
+            paginated=True,
+            next_cursor=next_cursor,
+        )
+
+    elif intent == "price_filter":
+        filter_type = entities.get("filter_type")
+        price = entities.get("price")
+        if not filter_type or price is None:
+            return ChatPlan(response="Please specify whether to filter products 'under' or 'above' a price.")
+
+        products, next_cursor = split_page(
+            lookups.products_by_price(filter_type, price, cursor, size), size, price_key
+        )
+        if not products:
+            return ChatPlan(response=f"No products found for the selected price filter.")
+
+        return ChatPlan(
+            rows=products,
+            texts=[p.description for p in products],
+            render=render_product_rows,
+            paginated=True,
+            next_cursor=next_cursor,
+        )
+
+    elif intent == "fetch_suppliers":
+        category = entities.get("category")
+        if not category:
+            return ChatPlan(response="Please specify the product category to fetch suppliers.")
+
+        category_ids = lookups.category_ids(category)
+        if not category_ids:
+            return ChatPlan(response=f"No suppliers found offering '{category}' products.")
+
+        suppliers, next_cursor = split_page(
+            lookups.suppliers_by_category(category_ids, cursor, size), size, id_key
+        )
+        if not suppliers:
+            return ChatPlan(response=f"No suppliers found offering '{category}' products.")
+
+        return ChatPlan(
+            rows=suppliers,
+            texts=[supplier_profile(s) for s in suppliers],
+            render=render_supplier_rows,
+            paginated=True,
+            next_cursor=next_cursor,
+        )
+
+    elif intent == "compare_products":
+        names = list(entities.get("products") or ())
+        if len(names) < 2:
+            return ChatPlan(response="Please specify at least two products to compare.")
+        if len(names) > COMPARE_MAX_PRODUCTS:
+            return ChatPlan(response=f"Please compare at most {COMPARE_MAX_PRODUCTS} products at a time.")
+
+        found = lookups.products_named(names)
+        missing = [name for name in names if found[name] is None]
+        if missing:
+            return ChatPlan(response=f"Could not find product(s): {', '.join(missing)}.")
+
+        # summarize_rows sends all of their descriptions to the summarizer together
+        rows = [found[name] for name in names]
+        return ChatPlan(rows=rows, texts=[p.description for p in rows], render=render_comparison)
+
+    elif intent == "general_query":
+        question = entities.get("question")
+        rows = lookups.similar(question) if question else []
+        if not rows:
+            return ChatPlan(response=UNCLEAR_RESPONSE, degraded=lookups.degraded)
+
+        plan = ChatPlan(rows=rows, texts=[row_text(row) for row in rows], render=render_matches)
+        if SEMANTIC_GENERATE_ANSWER:
+            plan.prompt = grounded_prompt(question, rows)
+        return plan
+
+    else:
+        return ChatPlan(response=UNCLEAR_RESPONSE)
+
+
+def cached_response(
+    parsed: Dict[str, Any], limit: Optional[int], cursor: Optional[str]
+) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Returns the response cache key for a parsed query, or None when the cache
+    is off or unavailable, and the body cached under it, if any.
+    """
+    if response_cache is None:
+        return None, None
+    generation = response_cache.generation()
+    if generation is None:
+        return None, None
+    cache_key = response_cache.key(generation, parsed, page_size(limit), cursor)
+    return cache_key, response_cache.get(cache_key)
+
+
+@router.post("/chat")
+def handle_chat(
+    query: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Main endpoint to handle chatbot queries.
+    Listings are paginated: pass the returned `next_cursor` back as `cursor` for the next page.
+    """
+    with span("parse"):
+        parsed = parse_query(query)
+
+    cache_key, cached = cached_response(parsed, limit, cursor)
+    if cached is not None:
+        return cached
 
     try:
-        if intent == "greeting":
-            return {"response": enhance_response(query, mode="greeting")}
-
-        elif intent == "product_details":
-            product_name = entities.get("product_name")
-            if not product_name:
-                return {"response": "Please specify the product name to fetch details."}
-
-            product = db.query(Product).filter(Product.name.ilike(f"%{product_name}%")).first()
-            if not product:
-                logger.info(f"Product '{product_name}' not found.")
-                return {"response": f"No product found with name '{product_name}'."}
-
-            product_details = {
-                "id": product.id,
-                "name": product.name,
-                "brand": product.brand,
-                "price": product.price,
-                "category": product.category,
-                "description": enhance_response(product.description, mode="summarize"),
-            }
-            return {"response": product_details}
-
-        elif intent == "fetch_products":
-            brand = entities.get("brand")
-            if not brand:
-                return {"response": "Please specify a brand to fetch products."}
-
-            products = db.query(Product).filter(Product.brand.ilike(f"%{brand}%")).all()
-            if not products:
-                logger.info(f"No products found under brand '{brand}'.")
-                return {"response": f"No products found for brand '{brand}'."}
-
-            return {
-                "response": [
-                    {
-                        "id": p.id,
-                        "name": p.name,
-                        "brand": p.brand,
-                        "price": p.price,
-                        "category": p.category,
-                        "description": enhance_response(p.description, mode="summarize"),
-                    }
-                    for p in products
-                ]
-            }
-
-        elif intent == "price_filter":
-            filter_type = entities.get("filter_type")
-            price = entities.get("price")
-            if not filter_type or not price:
-                return {"response": "Please specify whether to filter products 'under' or 'above' a price."}
-
-            products = db.query(Product).filter(
-                Product.price <= price if filter_type == "under" else Product.price >= price
-            ).all()
-            if not products:
-                return {"response": f"No products found for the selected price filter."}
-
-            return {
-                "response": [
-                    {
-                        "id": p.id,
-                        "name": p.name,
-                        "brand": p.brand,
-                        "price": p.price,
-                        "category": p.category,
-                        "description": enhance_response(p.description, mode="summarize"),
-                    }
-                    for p in products
-                ]
-            }
-
-        elif intent == "fetch_suppliers":
-            category = entities.get("category")
-            if not category:
-                return {"response": "Please specify the product category to fetch suppliers."}
-
-            suppliers = db.query(Supplier).filter(Supplier.product_categories_offered.ilike(f"%{category}%")).all()
-            if not suppliers:
-                return {"response": f"No suppliers found offering '{category}' products."}
-
-            return {
-                "response": [
-                    {
-                        "id": s.id,
-                        "name": s.name,
-                        "contact_info": s.contact_info,
-                        "product_categories_offered": s.product_categories_offered,
-                        "summary": enhance_response(
-                            f"Supplier Name: {s.name}\nContact Info: {s.contact_info}\nCategories Offered: {s.product_categories_offered}",
-                            mode="summarize"
-                        ),
-                    }
-                    for s in suppliers
-                ]
-            }
-
-        elif intent == "compare_products":
-            product_a = entities.get("product_a")
-            product_b = entities.get("product_b")
-            if not product_a or not product_b:
-                return {"response": "Please specify both products to compare."}
-
-            product_a_data = db.query(Product).filter(Product.name.ilike(f"%{product_a}%")).first()
-            product_b_data = db.query(Product).filter(Product.name.ilike(f"%{product_b}%")).first()
-
-            if not product_a_data or not product_b_data:
-                missing = ", ".join(p for p in [product_a, product_b] if not eval(f"product_{p.lower()}_data"))
-                return {"response": f"Could not find product(s): {missing}."}
-
-            return {
-                "response": {
-                    "Product A": {
-                        "Name": product_a_data.name,
-                        "Brand": product_a_data.brand,
-                        "Price": product_a_data.price,
-                        "Category": product_a_data.category,
-                        "Description": enhance_response(product_a_data.description, mode="summarize"),
-                    },
-                    "Product B": {
-                        "Name": product_b_data.name,
-                        "Brand": product_b_data.brand,
-                        "Price": product_b_data.price,
-                        "Category": product_b_data.category,
-                        "Description": enhance_response(product_b_data.description, mode="summarize"),
-                    },
-                }
-            }
+        lookups = Lookups(db)
+        with span("db"):
+            plan = plan_chat(db, parsed, limit, cursor, lookups)
+        summaries = complete_plan(plan)
+        with span("render"):
+            body = plan.body(summaries)
+        # The snapshot may lag a write that already moved the cache generation on
+        if cache_key is not None and not lookups.from_snapshot and not plan.degraded:
+            response_cache.set(cache_key, body)
+        return body
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing query: {e}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred. Please try again later.")
+
+
+class ChatBatchRequest(BaseModel):
+    queries: List[str]
+    limit: Optional[int] = None
 
-        else:
-            return {"response": "I'm sorry, I couldn't understand your request. Could you clarify further?"}
 
+@router.post("/chat/batch")
+def handle_chat_batch(request: ChatBatchRequest, db: Session = Depends(get_db)):
+    """
+    Answers many chat queries in one request, returning one result per query in query order.
+    Repeated queries are answered once, the lookups of each intent are fetched
+    together, and every description that needs summarizing goes through
+    shared summarizer batches. Listings return their first page.
+    A query that fails gets an "error" result without failing the others.
+    """
+    if len(request.queries) > CHAT_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {CHAT_BATCH_MAX_QUERIES} queries per batch.")
+
+    with span("parse"):
+        parsed = [parse_query(query) for query in request.queries]
+    keys = [(p["intent"], tuple(sorted(p["entities"].items()))) for p in parsed]
+
+    plans: Dict[Any, Any] = {}
+    with span("db"):
+        try:
+            lookups = BatchLookups(db, parsed, page_size(request.limit))
+        except Exception as e:
+            logger.error(f"Error fetching batch lookups: {e}")
+            raise HTTPException(status_code=500, detail="An unexpected error occurred. Please try again later.")
+
+        for key, query in zip(keys, parsed):
+            if key in plans:
+                continue
+            try:
+                plans[key] = plan_chat(db, query, request.limit, None, lookups)
+            except HTTPException as e:
+                plans[key] = {"error": e.detail}
+            except Exception as e:
+                logger.error(f"Error processing batch query: {e}")
+                plans[key] = {"error": "An unexpected error occurred."}
+
+    # Generate every answer in one call and summarize the rows of every plan
+    # together, then hand each plan its slice
+    planned = {key: plan for key, plan in plans.items() if isinstance(plan, ChatPlan)}
+    prompted = [plan for plan in planned.values() if plan.prompt is not None]
+    if prompted:
+        for plan, answer in zip(prompted, generate_responses([plan.prompt for plan in prompted])):
+            plan.answer = answer
+    summaries, _ = summarize_rows(
+        [row for plan in planned.values() for row in plan.rows],
+        [text for plan in planned.values() for text in plan.texts],
+    )
+
+    offset = 0
+    with span("render"):
+        for key, plan in planned.items():
+            plans[key] = plan.body(summaries[offset:offset + len(plan.rows)])
+            offset += len(plan.rows)
+    return {"results": [plans[key] for key in keys]}
+
+
+async def summarize_rows_async(rows: list, texts: List[Optional[str]]) -> List[Optional[str]]:
+    """
+    Runs summarize_rows on the bounded inference executor, one batch at a time,
+    so a cancelled request stops after the batch in flight.
+    """
+    loop = asyncio.get_running_loop()
+    summaries: List[Optional[str]] = []
+    for start in range(0, len(rows), SUMMARY_BATCH_SIZE):
+        end = start + SUMMARY_BATCH_SIZE
+        # Run in a copy of this context so the spans land in this request's Server-Timing
+        context = contextvars.copy_context()
+        batch, _ = await loop.run_in_executor(
+            inference_executor, context.run, summarize_rows, rows[start:end], texts[start:end]
+        )
+        summaries += batch
+    return summaries
+
+
+async def _cancel_on_disconnect(request: Request, task: asyncio.Task):
+    while not task.done():
+        if await request.is_disconnected():
+            logger.info("Client disconnected; cancelling chat request.")
+            task.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+@router.post("/chat/async")
+async def handle_chat_async(
+    query: str,
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Async variant of /chat: database work runs on the async engine and
+    summarization on the bounded inference executor. Work is cancelled when
+    the client disconnects.
+    """
+    with span("parse"):
+        parsed = parse_query(query)
+
+    async def answer():
+        loop = asyncio.get_running_loop()
+        hits = None
+        question = parsed["entities"].get("question") if parsed.get("intent") == "general_query" else None
+        if question:
+            # run_sync runs on the event loop, so the embedding and index search happen here first
+            context = contextvars.copy_context()
+            hits = await loop.run_in_executor(inference_executor, context.run, nearest_many, [question])
+        with span("db"):
+            plan = await db.run_sync(plan_chat, parsed, limit, cursor, None, hits)
+        if plan.prompt is not None:
+            context = contextvars.copy_context()
+            plan.answer = (await loop.run_in_executor(
+                inference_executor, context.run, generate_responses, [plan.prompt]
+            ))[0]
+        summaries = await summarize_rows_async(plan.rows, plan.texts)
+        with span("render"):
+            return plan.body(summaries)
+
+    task = asyncio.ensure_future(answer())
+    watcher = asyncio.ensure_future(_cancel_on_disconnect(request, task))
+    try:
+        return await task
+
+    except (asyncio.CancelledError, HTTPException):
+        raise
     except Exception as e:
         logger.error(f"Error processing query: {e}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred. Please try again later.")
+    finally:
+        watcher.cancel()
+
+
+def _event(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload) + "\n"
+
+
+def stream_chat(query: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Iterator[str]:
+    """
+    Yields the answer to `query` as NDJSON events.
+    Product listings are read in chunks, from the catalog snapshot while it is
+    fresh or else from the database cursor: each chunk is sent as a "rows"
+    event straight away, with stored summaries or raw descriptions, and
+    followed by a "summary" patch for every row that had to be summarized.
+    A final "page" event carries the cursor of the next page.
+    Other intents, and answers found in the response cache, are sent as a
+    single "response" event. Answers are cached the same way /chat caches them.
+    """
+    with span("parse"):
+        parsed = parse_query(query)
+    intent = parsed.get("intent")
+    entities = parsed.get("entities")
+    size = page_size(limit)
+
+    db = SessionLocal()
+    try:
+        cache_key, cached = cached_response(parsed, limit, cursor)
+        if cached is not None:
+            yield _event({"type": "response", **cached})
+            return
+
+        lookups = Lookups(db)
+        listing = None
+        if intent == "fetch_products" and entities.get("brand"):
+            if snapshot_ready():
+                listing = lookups.products_by_brand(entities["brand"], cursor, size)
+            else:
+                listing = products_by_brand(db, entities["brand"], cursor, size).yield_per(STREAM_CHUNK_SIZE)
+            key = id_key
+        elif intent == "price_filter" and entities.get("filter_type") and entities.get("price") is not None:
+            if snapshot_ready():
+                listing = lookups.products_by_price(entities["filter_type"], entities["price"], cursor, size)
+            else:
+                listing = products_by_price(
+                    db, entities["filter_type"], entities["price"], cursor, size
+                ).yield_per(STREAM_CHUNK_SIZE)
+            key = price_key
+
+        if listing is None:
+            plan = plan_chat(db, parsed, limit, cursor, lookups)
+            body = plan.body(complete_plan(plan))
+            if cache_key is not None and not lookups.from_snapshot and not plan.degraded:
+                response_cache.set(cache_key, body)
+            yield _event({"type": "response", **body})
+            return
+
+        page: List[Dict[str, Any]] = []
+        degraded = False
+        fetched = 0
+        next_cursor = None
+        chunk: list = []
+        for product in listing:
+            if fetched == size:
+                # keyset_page fetched one row past the page, so another page exists
+                next_cursor = encode_cursor(key(last))
+                break
+            chunk.append(product)
+            fetched += 1
+            last = product
+            if len(chunk) == STREAM_CHUNK_SIZE:
+                degraded |= yield from _stream_product_chunk(chunk, page)
+                chunk = []
+        if chunk:
+            degraded |= yield from _stream_product_chunk(chunk, page)
+
+        if not page:
+            if intent == "fetch_products":
+                body = {"response": f"No products found for brand '{entities['brand']}'."}
+            else:
+                body = {"response": "No products found for the selected price filter."}
+            yield _event({"type": "response", **body})
+        else:
+            body = {"response": page, "next_cursor": next_cursor}
+            yield _event({"type": "page", "next_cursor": next_cursor})
+        # The snapshot may lag a write that already moved the cache generation on
+        if cache_key is not None and not lookups.from_snapshot and not degraded:
+            response_cache.set(cache_key, body)
+
+    except HTTPException as e:
+        yield _event({"type": "error", "detail": e.detail})
+    except Exception as e:
+        logger.error(f"Error streaming query: {e}")
+        yield _event({"type": "error", "detail": "An unexpected error occurred. Please try again later."})
+    finally:
+        db.close()
+
+
+def _stream_product_chunk(products: list, page: List[Dict[str, Any]]) -> Iterator[str]:
+    """
+    Streams one chunk of a listing and adds its final rows to `page`.
+    Returns whether any of its summaries is degraded (see summarize_many).
+    """
+    offset = len(page)
+    stored = [stored_summary(p) for p in products]
+    raw = [summary if summary is not None else p.description for p, summary in zip(products, stored)]
+    rows = render_product_rows(products, raw)
+    yield _event({"type": "rows", "offset": offset, "rows": rows})
+
+    degraded = False
+    missing = [i for i, summary in enumerate(stored) if summary is None]
+    for start in range(0, len(missing), SUMMARY_BATCH_SIZE):
+        batch = missing[start:start + SUMMARY_BATCH_SIZE]
+        summaries, batch_degraded = summarize_many([products[i].description for i in batch])
+        degraded |= batch_degraded
+        for i, summary in zip(batch, summaries):
+            if summary != products[i].description:
+                rows[i] = {**rows[i], "description": summary}
+                yield _event({"type": "summary", "index": offset + i, "field": "description", "value": summary})
+    page.extend(rows)
+    return degraded
+
+
+@router.post("/chat/stream")
+def handle_chat_stream(query: str, limit: Optional[int] = None, cursor: Optional[str] = None):
+    """
+    Streaming variant of /chat that sends product rows before their summaries are ready.
+    """
+    return StreamingResponse(stream_chat(query, limit, cursor), media_type="application/x-ndjson")
@@ -15,7 +15,136 @@ POSTGRES_DB = os.getenv("POSTGRES_DB")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 
-# Connection string for SQLAlchemy
-DATABASE_URL = (
+# Connection string for SQLAlchemy; DATABASE_URL overrides it (e.g. sqlite:///./supplybot.db locally)
+DATABASE_URL = os.getenv("DATABASE_URL") or (
     f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 )
+
+# Connection string for the async engine: asyncpg for Postgres, aiosqlite for local SQLite
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (
+    DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if DATABASE_URL.startswith("postgresql://")
+    else DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+
+# Engine profile. Pool settings apply to Postgres; DB_PGBOUNCER leaves pooling to
+# PgBouncer (transaction mode) and avoids session state and prepared statements.
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 disables the timeout
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+# Model Configuration
+SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", "sshleifer/distilbart-cnn-12-6")
+GENERATOR_MODEL = os.getenv("GENERATOR_MODEL", "distilgpt2")
+# How the pipelines run on CPU: "pytorch" (fp32), "quantized" (dynamic int8
+# torch) or "onnx" (ONNX Runtime via optimum, exported once into ONNX_MODEL_DIR)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch").lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+# Torch CPU threads per process, as a number or "auto". Auto splits the available
+# cores across MODEL_PROCESSES processes (default: WEB_CONCURRENCY, the server's
+# worker count) times INFERENCE_CONCURRENCY model calls each.
+TORCH_THREADS = os.getenv("TORCH_THREADS", "auto")
+TORCH_INTEROP_THREADS = os.getenv("TORCH_INTEROP_THREADS", "auto")
+MODEL_PROCESSES = int(os.getenv("MODEL_PROCESSES", os.getenv("WEB_CONCURRENCY", "1")))
+# Model calls allowed to run at once in each process; others wait their turn
+INFERENCE_CONCURRENCY = int(os.getenv("INFERENCE_CONCURRENCY", "1"))
+
+# Summary cache configuration
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "4096"))
+SUMMARY_CACHE_PERSIST = os.getenv("SUMMARY_CACHE_PERSIST", "true").lower() == "true"
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "16"))
+# Days a persisted summary is kept before it is pruned (0 keeps them forever)
+SUMMARY_CACHE_MAX_AGE_DAYS = float(os.getenv("SUMMARY_CACHE_MAX_AGE_DAYS", "30"))
+
+# Model loading: warm pipelines in a background thread at startup, and whether
+# requests should wait for a model that is still loading or skip it
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+MODEL_WAIT_FOR_LOAD = os.getenv("MODEL_WAIT_FOR_LOAD", "false").lower() == "true"
+
+# Shared inference worker (inference_server.py). When INFERENCE_SOCKET is set,
+# API workers send model calls to it instead of loading the models themselves.
+# Calls it hasn't answered within INFERENCE_TIMEOUT seconds take the fallback path.
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "")
+INFERENCE_AUTHKEY = (os.getenv("INFERENCE_AUTHKEY") or SECRET_KEY or "").encode() or None
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "30"))
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "5"))
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "32"))
+
+# Async chat endpoint: threads available for model inference, and how often
+# (in seconds) to check whether the client has gone away
+INFERENCE_EXECUTOR_WORKERS = int(os.getenv("INFERENCE_EXECUTOR_WORKERS", "2"))
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.1"))
+
+# Rows fetched from the database cursor per chunk by the streaming chat endpoint
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "50"))
+
+# Pagination for product and supplier listings
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+# Add a Server-Timing header with per-stage durations to every response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+# Most queries accepted by one /chat/batch request
+CHAT_BATCH_MAX_QUERIES = int(os.getenv("CHAT_BATCH_MAX_QUERIES", "500"))
+
+# Most products one compare_products query may list
+COMPARE_MAX_PRODUCTS = int(os.getenv("COMPARE_MAX_PRODUCTS", "10"))
+
+# Cache of /chat responses keyed on the parsed intent: "memory" (per process, so
+# writes from other processes are only seen after RESPONSE_CACHE_TTL), "redis"
+# (shared and invalidated by every process's writes, needs the redis package) or "off"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))  # seconds
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Authentication caches: verified tokens (never kept past their exp) and user identities by username
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))  # seconds
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))  # seconds
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+# Password hashing: bcrypt cost, threads dedicated to it, and how many more
+# calls may wait for a thread before /login and /signup answer 503
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "16"))
+
+# Semantic retrieval for general_query (semantic_index.py). Embeddings are
+# memory-mapped from SEMANTIC_INDEX_DIR; catalogs above SEMANTIC_IVF_MIN_ROWS
+# are searched through SEMANTIC_NPROBE k-means lists instead of every row.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+SEMANTIC_INDEX_DIR = os.getenv("SEMANTIC_INDEX_DIR", "semantic_index_data")
+SEMANTIC_TOP_K = int(os.getenv("SEMANTIC_TOP_K", "5"))
+SEMANTIC_MIN_SCORE = float(os.getenv("SEMANTIC_MIN_SCORE", "0.3"))
+SEMANTIC_IVF_MIN_ROWS = int(os.getenv("SEMANTIC_IVF_MIN_ROWS", "20000"))
+SEMANTIC_NPROBE = int(os.getenv("SEMANTIC_NPROBE", "16"))
+SEMANTIC_RELOAD_INTERVAL = float(os.getenv("SEMANTIC_RELOAD_INTERVAL", "5"))  # seconds between index file checks
+# Also answer general queries with the generator, grounded in the retrieved rows
+SEMANTIC_GENERATE_ANSWER = os.getenv("SEMANTIC_GENERATE_ANSWER", "false").lower() == "true"
+
+# In-memory columnar copy of the products table that answers brand and price
+# listings (catalog_snapshot.py). It polls for changes every
+# CATALOG_SNAPSHOT_INTERVAL seconds; lookups go back to the database when the
+# last successful refresh is older than CATALOG_SNAPSHOT_MAX_STALENESS seconds.
+# Summaries stored by summarize_catalog.py are picked up every
+# CATALOG_SNAPSHOT_SUMMARY_INTERVAL seconds.
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT", "false").lower() == "true"
+CATALOG_SNAPSHOT_INTERVAL = float(os.getenv("CATALOG_SNAPSHOT_INTERVAL", "5"))
+CATALOG_SNAPSHOT_MAX_STALENESS = float(os.getenv("CATALOG_SNAPSHOT_MAX_STALENESS", "60"))
+CATALOG_SNAPSHOT_SUMMARY_INTERVAL = float(os.getenv("CATALOG_SNAPSHOT_SUMMARY_INTERVAL", "300"))
+
+# Typo-tolerant product name lookups for product_details and compare_products
+# (name_index.py): matches need a pg_trgm-style similarity of NAME_INDEX_MIN_SCORE,
+# queries with more than NAME_INDEX_MAX_CANDIDATES candidate names fall back to
+# the substring search, and the index polls for changed products every
+# NAME_INDEX_INTERVAL seconds
+NAME_INDEX = os.getenv("NAME_INDEX", "true").lower() == "true"
+NAME_INDEX_MIN_SCORE = float(os.getenv("NAME_INDEX_MIN_SCORE", "0.3"))
+NAME_INDEX_MAX_CANDIDATES = int(os.getenv("NAME_INDEX_MAX_CANDIDATES", "20000"))
+NAME_INDEX_INTERVAL = float(os.getenv("NAME_INDEX_INTERVAL", "5"))
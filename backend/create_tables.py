@@ -1,8 +1,31 @@
+from sqlalchemy import text
+
 from database import engine, SessionLocal
 from models import Base, Supplier, Product
+from migrate_categories import backfill_categories
+
+SEARCH_INDEXES = [
+    index
+    for table in (Product.__table__, Supplier.__table__)
+    for index in table.indexes
+    if index.name.endswith("_trgm")
+]
+
+def enable_trigram_search():
+    # The trigram GIN indexes need the pg_trgm extension on Postgres
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+def create_search_indexes():
+    # Adds the trigram indexes to an existing database without touching its data
+    enable_trigram_search()
+    for index in SEARCH_INDEXES:
+        index.create(bind=engine, checkfirst=True)
 
 def init_db():
     Base.metadata.drop_all(bind=engine)  # Drop existing tables (for demo)
+    enable_trigram_search()
     Base.metadata.create_all(bind=engine)
 
     db = SessionLocal()
@@ -372,6 +395,7 @@ def init_db():
     db.commit()
 
     db.close()
+    backfill_categories()
     print("Database initialized with updated sample data!")
 
 if __name__ == "__main__":
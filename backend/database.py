@@ -1,17 +1,156 @@
 # backend/database.py
 
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from config import DATABASE_URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DB_ECHO,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS,
+    DB_PGBOUNCER,
+)
+from metrics import Counter, Gauge, Histogram
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool", ["engine"]
+)
+POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT", ["engine"]
+)
+
+
+class TimedPoolMixin:
+    """
+    Records how long each connection checkout waits on the pool.
+    """
+    metrics_label = "sync"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc(engine=self.metrics_label)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, engine=self.metrics_label)
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedNullPool(TimedPoolMixin, NullPool):
+    pass
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """
+    Builds create_engine keyword arguments from the DB_* settings in config.py.
+    """
+    options = {"echo": DB_ECHO}
+    if not url.startswith("postgresql"):
+        return options
+
+    if DB_PGBOUNCER:
+        # PgBouncer owns the pool; every checkout is a fresh client connection
+        options["poolclass"] = TimedNullPool
+        if is_async:
+            # asyncpg's prepared statements don't survive transaction pooling
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+
+    options.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    if DB_STATEMENT_TIMEOUT_MS:
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
 
-engine = create_engine(DATABASE_URL, echo=True)
+
+def _set_local_statement_timeout(target):
+    # Session-level SETs leak between PgBouncer clients, so scope it to each transaction
+    @event.listens_for(target, "begin")
+    def set_statement_timeout(conn):
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {DB_STATEMENT_TIMEOUT_MS}")
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+if DB_PGBOUNCER and DB_STATEMENT_TIMEOUT_MS and engine.dialect.name == "postgresql":
+    _set_local_statement_timeout(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The async engine is created on first use so its driver (asyncpg/aiosqlite)
+# is only required when the async endpoint is actually called
+_async_engine = None
+_async_sessionmaker = None
+
+
+def get_async_sessionmaker():
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+        if DB_PGBOUNCER and DB_STATEMENT_TIMEOUT_MS and _async_engine.dialect.name == "postgresql":
+            _set_local_statement_timeout(_async_engine.sync_engine)
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
+
+def _pool_readings(read) -> dict:
+    readings = {}
+    for label, target in (("sync", engine), ("async", _async_engine)):
+        if target is not None and isinstance(target.pool, QueuePool):
+            readings[(label,)] = read(target.pool)
+    return readings
+
+
+Gauge("db_pool_size", "Connections kept open by the pool", lambda: _pool_readings(lambda p: p.size()), ["engine"])
+Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    lambda: _pool_readings(lambda p: p.checkedout()),
+    ["engine"],
+)
+Gauge(
+    "db_pool_overflow",
+    "Connections open beyond the pool size (negative while the pool is not yet full)",
+    lambda: _pool_readings(lambda p: p.overflow()),
+    ["engine"],
+)
+
+
 # Dependency to get the database session
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
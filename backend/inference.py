@@ -0,0 +1,241 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    SUMMARY_BATCH_SIZE,
+    INFERENCE_SOCKET,
+    INFERENCE_AUTHKEY,
+    INFERENCE_TIMEOUT,
+    INFERENCE_EXECUTOR_WORKERS,
+    INFERENCE_CONCURRENCY,
+)
+from model_registry import registry
+from metrics import Counter, span
+
+logger = logging.getLogger(__name__)
+
+# Bounded pool that async endpoints use for model calls, keeping them off the event loop
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_EXECUTOR_WORKERS, thread_name_prefix="inference")
+
+# Caps the model calls running at once so they don't compete for the torch threads
+inference_slots = threading.BoundedSemaphore(INFERENCE_CONCURRENCY)
+
+# Whitespace-delimited words, a cheap stand-in for tokenizer counts that works for remote workers too
+MODEL_TOKENS = Counter("model_tokens_total", "Approximate tokens sent to and produced by each model", ["model", "direction"])
+
+
+def count_tokens(model: str, inputs: List[str], outputs: Optional[List[Optional[str]]]):
+    MODEL_TOKENS.inc(sum(len(text.split()) for text in inputs), model=model, direction="input")
+    if outputs:
+        MODEL_TOKENS.inc(sum(len(text.split()) for text in outputs if text), model=model, direction="output")
+
+
+def summarize_texts(
+    texts: List[str],
+    batch_size: int = SUMMARY_BATCH_SIZE,
+    wait: bool = True,
+) -> Optional[List[Optional[str]]]:
+    """
+    Runs the summarizer over `texts` in this process and returns one summary per text.
+    Texts are sorted by length into padded batches of `batch_size`; items of a
+    batch that failed come back as None. Returns None if the model isn't loaded
+    yet and wait is False.
+    """
+    summarizer = registry.get("summarizer", wait=wait)
+    if summarizer is None:
+        return None
+
+    batch_size = max(1, batch_size)
+    results: List[Optional[str]] = [None] * len(texts)
+
+    # Group texts of similar length so each batch carries little padding
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i].split()))
+    for start in range(0, len(order), batch_size):
+        indexes = order[start:start + batch_size]
+        batch = [texts[i] for i in indexes]
+        input_lengths = [len(t.split()) for t in batch]
+
+        # Dynamically set max_length and min_length based on input length
+        max_length = min(100, int(max(input_lengths) * 1.5))  # 1.5 times input length
+        min_length = min(30, min(input_lengths))  # Ensure min_length does not exceed input length
+
+        try:
+            with inference_slots:
+                enhanced = summarizer(
+                    batch,
+                    max_length=max_length,
+                    min_length=min_length,
+                    do_sample=False,
+                    batch_size=len(batch),
+                )
+        except Exception as e:
+            logger.error(f"Error in summarize_texts: {e}")
+            continue
+
+        for i, output in zip(indexes, enhanced):
+            results[i] = output["summary_text"].strip()
+
+    return results
+
+
+def generate_texts(prompts: List[str], max_length: int = 150, wait: bool = True) -> Optional[List[Optional[str]]]:
+    """
+    Runs the text generator over `prompts` in this process as one batch.
+    Returns None if the model isn't loaded yet and wait is False.
+    """
+    generator = registry.get("generator", wait=wait)
+    if generator is None:
+        return None
+
+    try:
+        with inference_slots:
+            enhanced = generator(
+                prompts,
+                max_length=max_length,
+                num_return_sequences=1,
+                do_sample=False,
+                batch_size=len(prompts),
+            )
+    except Exception as e:
+        logger.error(f"Error in generate_texts: {e}")
+        return [None] * len(prompts)
+
+    return [output[0]["generated_text"].strip() for output in enhanced]
+
+
+def embed_texts(texts: List[str], wait: bool = True) -> Optional[List[Optional[List[float]]]]:
+    """
+    Returns a unit-length sentence embedding per text: the mean of the
+    embedder's token vectors. Returns None if the model isn't loaded yet and
+    wait is False.
+    """
+    embedder = registry.get("embedder", wait=wait)
+    if embedder is None:
+        return None
+
+    try:
+        with inference_slots:
+            outputs = embedder(texts)
+    except Exception as e:
+        logger.error(f"Error in embed_texts: {e}")
+        return [None] * len(texts)
+
+    vectors = []
+    for output in outputs:
+        vector = np.asarray(output, dtype=np.float32)[0].mean(axis=0)
+        vectors.append((vector / (np.linalg.norm(vector) or 1.0)).tolist())
+    return vectors
+
+
+class InferenceClient:
+    """
+    Client for the shared inference worker started with inference_server.py.
+    Each thread keeps its own connection to the worker's Unix socket. A call
+    not answered within `timeout` seconds returns None, like an unreachable
+    worker, and the connection is dropped so its late reply is never read.
+    """
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None, timeout: float = INFERENCE_TIMEOUT):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _call(self, mode: str, items: List[str]) -> Optional[List[Optional[str]]]:
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send((mode, items))
+                if not conn.poll(self.timeout):
+                    conn.close()
+                    self._local.conn = None
+                    logger.error(f"Inference worker at {self.address} did not answer within {self.timeout}s")
+                    return None
+                status, payload = conn.recv()
+                break
+            except (OSError, EOFError) as e:
+                self._local.conn = None
+                if attempt:
+                    logger.error(f"Inference worker at {self.address} is unavailable: {e}")
+                    return None
+
+        if status != "ok":
+            logger.error(f"Inference worker error: {payload}")
+            return [None] * len(items)
+        return payload
+
+    def summarize(self, texts: List[str]) -> Optional[List[Optional[str]]]:
+        return self._call("summarize", texts)
+
+    def generate(self, prompts: List[str]) -> Optional[List[Optional[str]]]:
+        return self._call("generate", prompts)
+
+    def embed(self, texts: List[str]) -> Optional[List[Optional[List[float]]]]:
+        return self._call("embed", texts)
+
+    def status(self) -> Optional[Dict[str, str]]:
+        """
+        The worker's model load states, as ModelRegistry.status reports them,
+        or None if the worker is unavailable.
+        """
+        states = self._call("status", [])
+        return states if isinstance(states, dict) else None
+
+
+inference_client = InferenceClient(INFERENCE_SOCKET, INFERENCE_AUTHKEY) if INFERENCE_SOCKET else None
+
+
+def summarize(texts: List[str], batch_size: int = SUMMARY_BATCH_SIZE, wait: bool = True) -> Optional[List[Optional[str]]]:
+    """
+    Summarizes `texts` on the shared inference worker when one is configured,
+    otherwise in this process.
+    """
+    with span("summarize"):
+        if inference_client is not None:
+            summaries = inference_client.summarize(texts)
+        else:
+            summaries = summarize_texts(texts, batch_size=batch_size, wait=wait)
+    count_tokens("summarizer", texts, summaries)
+    return summaries
+
+
+def generate(prompts: List[str], wait: bool = True) -> Optional[List[Optional[str]]]:
+    """
+    Generates text for `prompts` on the shared inference worker when one is
+    configured, otherwise in this process.
+    """
+    with span("generate"):
+        if inference_client is not None:
+            responses = inference_client.generate(prompts)
+        else:
+            responses = generate_texts(prompts, wait=wait)
+    # generated_text echoes the prompt; only count what the model added
+    completions = [r[len(p):] if r and r.startswith(p) else r for p, r in zip(prompts, responses or [])]
+    count_tokens("generator", prompts, completions)
+    return responses
+
+
+def embed(texts: List[str], wait: bool = True) -> Optional[List[Optional[List[float]]]]:
+    """
+    Embeds `texts` on the shared inference worker when one is configured,
+    otherwise in this process.
+    """
+    with span("embed"):
+        if inference_client is not None:
+            vectors = inference_client.embed(texts)
+        else:
+            vectors = embed_texts(texts, wait=wait)
+    count_tokens("embedder", texts, None)
+    return vectors
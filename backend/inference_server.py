@@ -0,0 +1,142 @@
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Listener
+from typing import List, Tuple
+
+from config import (
+    INFERENCE_SOCKET,
+    INFERENCE_AUTHKEY,
+    INFERENCE_BATCH_WINDOW_MS,
+    INFERENCE_MAX_BATCH,
+    SUMMARY_BATCH_SIZE,
+)
+from inference import summarize_texts, generate_texts, embed_texts
+from model_registry import registry
+
+logger = logging.getLogger(__name__)
+
+RUNNERS = {
+    "summarize": lambda items: summarize_texts(items, batch_size=SUMMARY_BATCH_SIZE),
+    "generate": generate_texts,
+    "embed": embed_texts,
+}
+
+
+class MicroBatcher:
+    """
+    Collects summarize/generate calls from all connected API workers for up to
+    `window_ms` and runs each mode as a single model call.
+    """
+
+    def __init__(self, window_ms: float = INFERENCE_BATCH_WINDOW_MS, max_batch: int = INFERENCE_MAX_BATCH):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[str, List[str], Future]]" = queue.Queue()
+        threading.Thread(target=self._run, name="micro-batcher", daemon=True).start()
+
+    def submit(self, mode: str, items: List[str]) -> Future:
+        if mode not in RUNNERS:
+            raise ValueError(f"Unknown inference mode '{mode}'")
+        future = Future()
+        self._queue.put((mode, items, future))
+        return future
+
+    def _collect(self) -> List[Tuple[str, List[str], Future]]:
+        requests = [self._queue.get()]
+        size = len(requests[0][1])
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            requests.append(request)
+            size += len(request[1])
+        return requests
+
+    def _run(self):
+        while True:
+            requests = self._collect()
+            for mode, runner in RUNNERS.items():
+                group = [(items, future) for m, items, future in requests if m == mode]
+                if not group:
+                    continue
+
+                merged = [item for items, _ in group for item in items]
+                try:
+                    outputs = runner(merged)
+                except Exception as e:
+                    logger.error(f"Error running {mode} batch: {e}")
+                    for _, future in group:
+                        future.set_exception(e)
+                    continue
+
+                offset = 0
+                for items, future in group:
+                    future.set_result(outputs[offset:offset + len(items)])
+                    offset += len(items)
+
+
+def serve_connection(conn, batcher: MicroBatcher):
+    """
+    Answers requests from one API worker connection until it disconnects.
+    """
+    with conn:
+        while True:
+            try:
+                mode, items = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            try:
+                if mode == "status":
+                    # Readiness checks from the API workers skip the batcher
+                    conn.send(("ok", registry.status()))
+                    continue
+                conn.send(("ok", batcher.submit(mode, items).result()))
+            except (EOFError, OSError):
+                return
+            except Exception as e:
+                conn.send(("error", str(e)))
+
+
+def serve(address: str = INFERENCE_SOCKET):
+    """
+    Loads the models once and serves inference for every API worker on a Unix socket.
+    """
+    if not address:
+        raise SystemExit("Set INFERENCE_SOCKET or pass --socket to choose the Unix socket path.")
+    if os.path.exists(address):
+        os.unlink(address)
+
+    for name in ("summarizer", "generator", "embedder"):
+        registry.get(name)
+
+    batcher = MicroBatcher()
+    with Listener(address, family="AF_UNIX", authkey=INFERENCE_AUTHKEY) as listener:
+        os.chmod(address, 0o600)
+        logger.info(f"Inference worker listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                logger.error(f"Rejected inference connection: {e}")
+                continue
+            threading.Thread(target=serve_connection, args=(conn, batcher), daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared model inference worker for the API processes.")
+    parser.add_argument("--socket", default=INFERENCE_SOCKET, help="Unix socket path to listen on")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(args.socket)
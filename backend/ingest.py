@@ -0,0 +1,243 @@
+import argparse
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List
+
+from sqlalchemy import column, exists, inspect, literal, or_, select, table as sql_table, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateIndex
+
+from database import engine, SessionLocal
+from models import Base, Product, Supplier, supplier_categories
+from categories import sync_supplier_categories
+from create_tables import enable_trigram_search
+import response_cache  # noqa: F401 (its commit listeners invalidate the shared chat response cache)
+
+# Columns accepted from catalog files, with the type each value is parsed as
+COLUMNS: Dict[str, Dict[str, Callable[[str], Any]]] = {
+    "products": {
+        "name": str,
+        "brand": str,
+        "price": float,
+        "category": str,
+        "description": str,
+        "supplier_id": int,
+    },
+    "suppliers": {
+        "name": str,
+        "contact_info": str,
+        "product_categories_offered": str,
+    },
+}
+
+# Natural key each table is upserted on
+NATURAL_KEYS = {
+    "products": ["name", "brand"],
+    "suppliers": ["name"],
+}
+
+MODELS = {"products": Product, "suppliers": Supplier}
+
+# Link tables that only hold rows derived from the table they belong to
+LINK_TABLES = {"suppliers": [supplier_categories]}
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Streams records from a .csv or .jsonl file one at a time.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def clean_records(records: Iterator[Dict[str, Any]], table: str) -> Iterator[Dict[str, Any]]:
+    """
+    Keeps the known columns of each record and parses their values.
+    Products may name their supplier with `supplier_name` instead of `supplier_id`.
+    """
+    columns = COLUMNS[table]
+    supplier_ids = None
+    for record in records:
+        if table == "products" and not record.get("supplier_id") and record.get("supplier_name"):
+            if supplier_ids is None:
+                db = SessionLocal()
+                try:
+                    supplier_ids = dict(db.query(Supplier.name, Supplier.id))
+                finally:
+                    db.close()
+            record["supplier_id"] = supplier_ids.get(record["supplier_name"])
+
+        row = {}
+        for name, parse in columns.items():
+            value = record.get(name)
+            row[name] = None if value in (None, "") else parse(value)
+        if row["name"] is None:
+            continue  # The natural key needs a name
+        yield row
+
+
+def chunked(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def dedupe(rows: List[Dict[str, Any]], key: List[str]) -> List[Dict[str, Any]]:
+    # A single upsert statement may not touch the same row twice; the last record wins
+    return list({tuple(row[k] for k in key): row for row in rows}.values())
+
+
+def upsert_statement(table, rows_source, key: List[str], columns: List[str]):
+    """
+    Builds INSERT ... ON CONFLICT (key) DO UPDATE for Postgres or SQLite.
+    Rows whose values didn't change are left alone so their updated_at, and
+    with it their stored summary, stays valid.
+    """
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(table)
+    if rows_source is not None:
+        stmt = stmt.from_select(columns + ["updated_at"], rows_source)
+    updates = [c for c in columns if c not in key]
+    # Conflict target: the expressions of the table's unique natural-key index
+    natural_key = next(index for index in table.indexes if index.unique)
+    return stmt.on_conflict_do_update(
+        index_elements=list(natural_key.expressions),
+        set_={**{c: stmt.excluded[c] for c in updates}, "updated_at": stmt.excluded.updated_at},
+        where=or_(*(table.c[c].is_distinct_from(stmt.excluded[c]) for c in updates)),
+    )
+
+
+def load_with_insert(conn, table, rows: List[Dict[str, Any]], key: List[str], columns: List[str]):
+    now = datetime.utcnow()
+    conn.execute(upsert_statement(table, None, key, columns), [{**row, "updated_at": now} for row in rows])
+
+
+def load_with_copy(conn, table, rows: List[Dict[str, Any]], key: List[str], columns: List[str]):
+    """
+    Postgres only: COPYs the chunk into a temporary staging table and upserts from there.
+    """
+    staging = f"ingest_{table.name}"
+    conn.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS AS "
+        f"SELECT {', '.join(columns)} FROM {table.name} WITH NO DATA"
+    ))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["\\N" if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {staging} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+        )
+    finally:
+        cursor.close()
+
+    source = select(*[column(c) for c in columns], literal(datetime.utcnow()).label("updated_at")).select_from(
+        sql_table(staging)
+    )
+    conn.execute(upsert_statement(table, source, key, columns))
+
+
+LOADERS = {"insert": load_with_insert, "copy": load_with_copy}
+
+
+def recreate_table(table_name: str):
+    """
+    Drops and recreates `table_name` and its link tables, leaving every other
+    table alone. Tables with a foreign key to it are recreated too, but only
+    while they are empty; otherwise their rows would lose their parent.
+    """
+    table = MODELS[table_name].__table__
+    tables = [table, *LINK_TABLES.get(table_name, [])]
+    referencing = [
+        other for other in Base.metadata.sorted_tables
+        if other not in tables and any(fk.column.table is table for fk in other.foreign_keys)
+    ]
+    with engine.connect() as conn:
+        for other in referencing:
+            if inspect(conn).has_table(other.name) and conn.execute(select(exists().select_from(other))).scalar():
+                raise SystemExit(
+                    f"{other.name} still references {table_name}; load without --drop or empty {other.name} first."
+                )
+
+    enable_trigram_search()
+    Base.metadata.drop_all(bind=engine, tables=tables + referencing)
+    Base.metadata.create_all(bind=engine, tables=tables + referencing)
+
+
+def ingest(path: str, table_name: str, chunk_size: int = 5000, drop: bool = False, method: str = "insert") -> int:
+    """
+    Loads a catalog file into `table_name` in chunks of `chunk_size`, upserting on
+    the table's natural key. With drop=True that table is recreated first.
+    Returns the number of records read.
+    """
+    if method == "copy" and engine.dialect.name != "postgresql":
+        raise SystemExit("--method copy needs Postgres; use --method insert.")
+
+    if drop:
+        recreate_table(table_name)
+    Base.metadata.create_all(bind=engine)
+
+    model = MODELS[table_name]
+    table = model.__table__
+    key = NATURAL_KEYS[table_name]
+    columns = list(COLUMNS[table_name])
+    load = LOADERS[method]
+
+    # ON CONFLICT needs the natural-key index, which older databases lack
+    with engine.begin() as conn:
+        for index in table.indexes:
+            if index.unique:
+                # Reflection can't see expression indexes on SQLite, so checkfirst would miss it
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+    started = time.perf_counter()
+    total = 0
+    for chunk in chunked(clean_records(read_records(path), table_name), chunk_size):
+        chunk = dedupe(chunk, key)
+        with engine.begin() as conn:
+            load(conn, table, chunk, key, columns)
+
+        if table_name == "suppliers":
+            db = SessionLocal()
+            try:
+                names = [row["name"] for row in chunk]
+                sync_supplier_categories(db, db.query(Supplier).filter(Supplier.name.in_(names)).all())
+                db.commit()
+            finally:
+                db.close()
+
+        total += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"{table_name}: {total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load a supplier or product catalog from CSV or JSONL.")
+    parser.add_argument("path", help="Catalog file (.csv or .jsonl)")
+    parser.add_argument("--table", choices=sorted(COLUMNS), default="products", help="Table to load into")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Records per batch")
+    parser.add_argument("--method", choices=sorted(LOADERS), default="insert",
+                        help="Batched INSERT ... VALUES, or COPY through a staging table (Postgres)")
+    parser.add_argument("--drop", action="store_true",
+                        help="Drop and recreate the target table before loading instead of upserting into it")
+    args = parser.parse_args()
+
+    ingest(args.path, args.table, chunk_size=args.chunk_size, drop=args.drop, method=args.method)
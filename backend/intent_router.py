@@ -0,0 +1,114 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Intents in priority order: (intent, words a matching query can start with, pattern).
+# Named groups become entities; a pattern must match the whole query. An intent
+# whose leading word can't be listed uses None and is tried for every query.
+INTENTS: List[Tuple[str, Optional[Tuple[str, ...]], str]] = [
+    ("greeting", ("hello", "hi", "hey", "greetings"), r"(?:hello|hi|hey|greetings)\.?"),
+    (
+        "price_filter",
+        ("show", "list"),
+        r"(?:show me|list)\s+products\s+(?P<filter_type>under|above)\s+\$?(?P<price>\d+\.?\d*)\.?",
+    ),
+    ("compare_products", ("compare",), r"compare\s+(?P<products>[\w\s,]+?)\.?"),
+    (
+        "fetch_products",
+        ("show", "list", "display"),
+        r"(?:show me|list|display)\s+(?:all\s+)?products\s+(?:by|for|under)\s+brand\s+(?P<brand>[\w\s]+)\.?",
+    ),
+    (
+        "fetch_suppliers",
+        ("which", "what", "list", "tell"),
+        r"(?:which|what|list|tell me about)\s+suppliers\s+(?:that\s+)?(?:provide|offer)\s+(?P<category>[\w\s]+)\.?",
+    ),
+    (
+        "product_details",
+        ("give", "provide", "show"),
+        r"(?:give me|provide|show)\s+details\s+(?:of|about|for)\s+product\s+(?P<product_name>[\w\s]+)\.?",
+    ),
+]
+
+_PRODUCT_SEPARATOR = re.compile(r"\s*,\s*|\s+(?:with|vs|versus)\s+")
+_AND = re.compile(r"\s+and\s+")
+
+
+def product_list(text: str) -> Tuple[str, ...]:
+    """
+    Splits "a, b and c", "a with b" or "a vs b" into distinct product names.
+    Only the last name is split on "and", so "salt and pepper grinder, x
+    and y" keeps its first name whole.
+    """
+    names = [name for name in _PRODUCT_SEPARATOR.split(text) if name]
+    if names:
+        names[-1:] = _AND.split(names[-1])
+    return tuple(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+# Entities that are not plain strings. Values must stay hashable, as they
+# key the /chat/batch deduplication.
+ENTITY_TYPES: Dict[str, Callable[[str], Any]] = {"price": float, "products": product_list}
+
+FALLBACK_INTENT = "general_query"
+
+_GROUP = re.compile(r"\(\?P<(\w+)>")
+_FIRST_WORD = re.compile(r"\w+")
+_SEPARATOR = "__"
+
+
+class IntentRouter:
+    """
+    Routes a query to its intent in a single regex match.
+    Intents are bucketed by the words they can start with, and each bucket is
+    compiled into one alternation in which every intent is an outer named
+    group and its entity groups are prefixed with the intent name to stay
+    unique. A query only runs against the bucket of its first word, so adding
+    intents that start with other words costs nothing.
+    """
+
+    def __init__(self, intents: List[Tuple[str, Optional[Tuple[str, ...]], str]], fallback: str = FALLBACK_INTENT):
+        self.fallback = fallback
+        self._entities: Dict[str, List[Tuple[str, str]]] = {}
+        branches: List[Tuple[Optional[Tuple[str, ...]], str]] = []
+        for intent, words, pattern in intents:
+            names = _GROUP.findall(pattern)
+            self._entities[intent] = [(f"{intent}{_SEPARATOR}{name}", name) for name in names]
+            pattern = _GROUP.sub(lambda m: f"(?P<{intent}{_SEPARATOR}{m.group(1)}>", pattern)
+            branches.append((words, f"(?P<{intent}>{pattern})"))
+
+        # Branches keep their priority order within each bucket
+        leading = {word for words, _ in branches if words for word in words}
+        self._buckets = {
+            word: self._compile([b for words, b in branches if words is None or word in words]) for word in leading
+        }
+        self._anywhere = self._compile([b for words, b in branches if words is None])
+
+    @staticmethod
+    def _compile(branches: List[str]) -> Optional[re.Pattern]:
+        if not branches:
+            return None
+        return re.compile(r"(?:" + "|".join(branches) + r")\Z", re.IGNORECASE)
+
+    def route(self, query: str) -> Dict[str, Any]:
+        """
+        Returns {"intent": ..., "entities": {...}} for `query`. Entities are
+        lowercased and stripped; queries no pattern matches fall back to the
+        catch-all intent with the question as their only entity.
+        """
+        text = query.strip()
+        word = _FIRST_WORD.match(text)
+        pattern = self._buckets.get(word.group().lower(), self._anywhere) if word else self._anywhere
+        match = pattern.match(text) if pattern is not None else None
+        if match is None:
+            return {"intent": self.fallback, "entities": {"question": text}}
+
+        # The outer intent group closes last, so it is the match's lastgroup
+        intent = match.lastgroup
+        entities = {}
+        for group, name in self._entities[intent]:
+            value = match.group(group).strip().lower()
+            entities[name] = ENTITY_TYPES.get(name, str)(value)
+        return {"intent": intent, "entities": entities}
+
+
+intent_router = IntentRouter(INTENTS)
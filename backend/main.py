@@ -1,19 +1,21 @@
-from fastapi import FastAPI, Depends, HTTPException
+import time
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from auth import router as auth_router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from auth import router as auth_router, get_current_user  # noqa: F401 - the one auth dependency, kept importable here
+from catalog_snapshot import catalog_snapshot
 from chatbot import router as chatbot_router
-from database import get_db
-from jose import jwt, JWTError
-from models import User
-from config import SECRET_KEY, ALGORITHM
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from name_index import name_index
+from config import MODEL_WARMUP, SERVER_TIMING
+from inference import inference_client
+from model_registry import registry
+from summarize_catalog import ensure_summary_columns
+from metrics import render_metrics, start_request_timing, server_timing
 
 
 app = FastAPI()
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
-
 origins = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
@@ -25,24 +27,77 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    # Lets the browser's network panel break a request down by stage
+    if not SERVER_TIMING:
+        return await call_next(request)
+    timings = start_request_timing()
+    started = time.perf_counter()
+    response = await call_next(request)
+    timings.append(("total", time.perf_counter() - started))
+    response.headers["Server-Timing"] = server_timing(timings)
+    response.headers["Timing-Allow-Origin"] = ", ".join(origins)
+    return response
+
+
 app.include_router(auth_router)
 app.include_router(chatbot_router, prefix="/api")
 
+@app.on_event("startup")
+def migrate_summary_columns():
+    # Every product query reads the summary columns, so add them to older databases first
+    ensure_summary_columns()
+
+@app.on_event("startup")
+def warm_up_models():
+    # Load the model pipelines in the background so startup isn't blocked on them;
+    # with a shared inference worker the models live there and this process loads none
+    if MODEL_WARMUP and inference_client is None:
+        registry.warm_up()
+
+@app.on_event("startup")
+def start_catalog_snapshot():
+    # Brand and price listings are served from memory once the first load finishes
+    if catalog_snapshot is not None:
+        catalog_snapshot.start()
+
+@app.on_event("startup")
+def start_name_index():
+    # Product name lookups tolerate typos once the index has loaded
+    if name_index is not None:
+        name_index.start()
+
 @app.get("/")
 def root():
     return {"message": "Hello from Chatbot Backend!"}
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        user = db.query(User).filter(User.username == username).first()
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
\ No newline at end of file
+@app.get("/ready")
+def ready():
+    """
+    Readiness probe: 200 once every model pipeline is loaded, 503 while they are still warming.
+    With a shared inference worker, its models are reported instead, and 503
+    while it is unreachable.
+    """
+    if inference_client is not None:
+        models = inference_client.status() or {}
+        is_ready = bool(models) and all(state == "loaded" for state in models.values())
+    else:
+        models = registry.status()
+        is_ready = registry.is_ready()
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "models": models},
+    )
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus scrape endpoint.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
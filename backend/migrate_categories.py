@@ -0,0 +1,50 @@
+import argparse
+
+from sqlalchemy import text
+
+from database import engine, SessionLocal
+from models import Category, Supplier, supplier_categories
+from categories import sync_supplier_categories
+
+
+def backfill_categories(chunk_size: int = 1000):
+    """
+    Creates the categories tables if needed and fills them from the
+    comma-separated product_categories_offered strings. Safe to re-run.
+    """
+    Category.__table__.create(bind=engine, checkfirst=True)
+    supplier_categories.create(bind=engine, checkfirst=True)
+    # Category lookups join supplier_categories now, so the trigram index on the strings is unused
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_suppliers_categories_trgm"))
+
+    db = SessionLocal()
+    known = {}
+    total = 0
+    last_id = 0
+    try:
+        while True:
+            suppliers = (
+                db.query(Supplier)
+                .filter(Supplier.id > last_id)
+                .order_by(Supplier.id)
+                .limit(chunk_size)
+                .all()
+            )
+            if not suppliers:
+                break
+            last_id = suppliers[-1].id
+            sync_supplier_categories(db, suppliers, known)
+            db.commit()
+            db.expunge_all()
+            total += len(suppliers)
+    finally:
+        db.close()
+    print(f"Backfilled categories for {total} suppliers ({len(known)} categories)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the categories tables from supplier category strings.")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Suppliers processed per transaction")
+    args = parser.parse_args()
+    backfill_categories(args.chunk_size)
@@ -0,0 +1,252 @@
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import (
+    SUMMARIZER_MODEL,
+    GENERATOR_MODEL,
+    EMBEDDING_MODEL,
+    INFERENCE_BACKEND,
+    ONNX_MODEL_DIR,
+    TORCH_THREADS,
+    TORCH_INTEROP_THREADS,
+    MODEL_PROCESSES,
+    INFERENCE_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Loads model pipelines on first use instead of at import time.
+    Each model is loaded at most once per process, either by the first caller
+    that needs it or by a background warm-up thread started with the app.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._loading = set()
+        self._state_lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """
+        Registers a zero-argument callable that builds the model `name`.
+        """
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def _load(self, name: str) -> Any:
+        with self._locks[name]:
+            if name in self._models:
+                return self._models[name]
+
+            with self._state_lock:
+                self._loading.add(name)
+            try:
+                logger.info(f"Loading model '{name}'")
+                model = self._factories[name]()
+                self._models[name] = model
+                self._errors.pop(name, None)
+                logger.info(f"Model '{name}' loaded")
+                return model
+            except Exception as e:
+                self._errors[name] = str(e)
+                logger.error(f"Error loading model '{name}': {e}")
+                raise
+            finally:
+                with self._state_lock:
+                    self._loading.discard(name)
+
+    def _load_in_background(self, name: str):
+        def target():
+            try:
+                self._load(name)
+            except Exception:
+                pass  # Already logged; the next blocking get() retries
+
+        threading.Thread(target=target, name=f"load-{name}", daemon=True).start()
+
+    def get(self, name: str, wait: bool = True) -> Optional[Any]:
+        """
+        Returns the model `name`, loading it if necessary.
+        With wait=False, a model that isn't loaded yet is scheduled for loading
+        in the background and None is returned immediately.
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if wait:
+            return self._load(name)
+
+        if name not in self._loading:
+            self._load_in_background(name)
+        return None
+
+    def set(self, name: str, model: Any):
+        """
+        Installs an already built model, e.g. a stub in benchmarks.
+        """
+        self._models[name] = model
+
+    def warm_up(self):
+        """
+        Starts loading every registered model in a background thread.
+        """
+        def target():
+            for name in self._factories:
+                try:
+                    self._load(name)
+                except Exception:
+                    pass  # Already logged; the next blocking get() retries
+
+        threading.Thread(target=target, name="model-warmup", daemon=True).start()
+
+    def status(self) -> Dict[str, str]:
+        """
+        Returns the load state of every registered model.
+        """
+        states = {}
+        for name in self._factories:
+            if name in self._models:
+                states[name] = "loaded"
+            elif name in self._loading:
+                states[name] = "loading"
+            elif name in self._errors:
+                states[name] = "failed"
+            else:
+                states[name] = "not_loaded"
+        return states
+
+    def is_ready(self) -> bool:
+        return all(name in self._models for name in self._factories)
+
+
+def available_cores() -> int:
+    # Respects CPU affinity and container cpusets where the platform reports them
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def torch_thread_counts(processes: int = MODEL_PROCESSES) -> Tuple[int, int]:
+    """
+    Returns the (intra-op, inter-op) thread counts for this process. In auto
+    mode every concurrent model call across `processes` gets an equal share
+    of the cores, and inter-op parallelism is off.
+    """
+    if TORCH_THREADS == "auto":
+        intra = max(1, available_cores() // max(1, processes * INFERENCE_CONCURRENCY))
+    else:
+        intra = int(TORCH_THREADS)
+    inter = 1 if TORCH_INTEROP_THREADS == "auto" else int(TORCH_INTEROP_THREADS)
+    return intra, inter
+
+
+_threads_configured = False
+
+
+def configure_torch_threads(processes: int = MODEL_PROCESSES):
+    """
+    Applies torch_thread_counts() once per process, before the first model is built.
+    """
+    global _threads_configured
+    if _threads_configured:
+        return
+    _threads_configured = True
+
+    intra, inter = torch_thread_counts(processes)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(intra)
+    try:
+        torch.set_num_interop_threads(inter)
+    except RuntimeError as e:
+        # Only allowed before torch has run any parallel work in this process
+        logger.error(f"Could not set torch inter-op threads: {e}")
+    logger.info(f"Torch using {intra} intra-op and {inter} inter-op threads")
+
+
+def _onnx_model(task: str, model_name: str):
+    from optimum.onnxruntime import ORTModelForCausalLM, ORTModelForFeatureExtraction, ORTModelForSeq2SeqLM
+
+    model_class = {
+        "summarization": ORTModelForSeq2SeqLM,
+        "text-generation": ORTModelForCausalLM,
+        "feature-extraction": ORTModelForFeatureExtraction,
+    }[task]
+    export_dir = os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "--"))
+    if os.path.isdir(export_dir):
+        return model_class.from_pretrained(export_dir)
+
+    # Export once and reuse the ONNX files on later starts
+    model = model_class.from_pretrained(model_name, export=True)
+    model.save_pretrained(export_dir)
+    return model
+
+
+def build_pipeline(task: str, model_name: str, backend: str = INFERENCE_BACKEND):
+    """
+    Builds a transformers pipeline for `task` on the given inference backend.
+    "quantized" converts the Linear layers to dynamic int8; "onnx" runs the
+    model on ONNX Runtime. If the backend can't be set up, the plain
+    PyTorch pipeline is returned instead. The backend actually used is
+    recorded on the pipeline as `inference_backend`.
+    """
+    from transformers import pipeline
+
+    configure_torch_threads()
+    built = None
+    try:
+        if backend == "quantized":
+            import torch
+
+            built = pipeline(task, model=model_name)
+            built.model = torch.quantization.quantize_dynamic(built.model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif backend == "onnx":
+            from transformers import AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            built = pipeline(task, model=_onnx_model(task, model_name), tokenizer=tokenizer)
+        elif backend != "pytorch":
+            raise ValueError(f"Unknown INFERENCE_BACKEND '{backend}'")
+    except Exception as e:
+        logger.error(f"Error setting up the {backend} backend for {model_name}, using PyTorch: {e}")
+        built, backend = None, "pytorch"
+
+    if built is None:
+        built = pipeline(task, model=model_name)
+    built.inference_backend = backend
+    return built
+
+
+def _summarizer():
+    # Summarization pipeline with DistilBART
+    return build_pipeline("summarization", SUMMARIZER_MODEL)
+
+
+def _generator():
+    # Text-generation pipeline with DistilGPT2
+    generator = build_pipeline("text-generation", GENERATOR_MODEL)
+    # GPT-2 has no pad token; batched prompts are left-padded with EOS
+    if generator.tokenizer.pad_token is None:
+        generator.tokenizer.pad_token = generator.tokenizer.eos_token
+    generator.tokenizer.padding_side = "left"
+    return generator
+
+
+def _embedder():
+    # Token embeddings for semantic_index.py; inference.embed_texts pools them
+    return build_pipeline("feature-extraction", EMBEDDING_MODEL)
+
+
+registry = ModelRegistry()
+registry.register("summarizer", _summarizer)
+registry.register("generator", _generator)
+registry.register("embedder", _embedder)
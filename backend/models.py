@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Index, Table, func, literal_column
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -22,6 +23,23 @@ class Preference(Base):
 
     user = relationship("User", back_populates="preferences")
 
+# Supplier <-> category association; the category-first index serves "suppliers offering X"
+supplier_categories = Table(
+    "supplier_categories",
+    Base.metadata,
+    Column("supplier_id", Integer, ForeignKey("suppliers.id", ondelete="CASCADE"), primary_key=True),
+    Column("category_id", Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_supplier_categories_category_supplier", "category_id", "supplier_id"),
+)
+
+class Category(Base):
+    __tablename__ = "categories"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, nullable=False)
+
+    suppliers = relationship("Supplier", secondary=supplier_categories, back_populates="categories")
+
 class Supplier(Base):
     __tablename__ = "suppliers"
 
@@ -29,8 +47,18 @@ class Supplier(Base):
     name = Column(String(100), nullable=False)
     contact_info = Column(String(200))
     product_categories_offered = Column(String(200))
+    summary = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # updated_at of the row version that `summary` was computed from
+    summarized_at = Column(DateTime)
 
     products = relationship("Product", back_populates="supplier")
+    categories = relationship("Category", secondary=supplier_categories, back_populates="suppliers")
+
+    __table_args__ = (
+        # Natural key used by ingest.py to upsert supplier catalogs
+        Index("uq_suppliers_name", "name", unique=True),
+    )
 
 class Product(Base):
     __tablename__ = "products"
@@ -42,5 +70,25 @@ class Product(Base):
     category = Column(String(100))
     description = Column(Text)
     supplier_id = Column(Integer, ForeignKey("suppliers.id"))
+    summary = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # updated_at of the row version that `summary` was computed from
+    summarized_at = Column(DateTime)
 
     supplier = relationship("Supplier", back_populates="products")
+
+    __table_args__ = (
+        # Natural key used by ingest.py to upsert product catalogs. Unique indexes treat
+        # NULLs as distinct, so a missing brand is keyed as '' to let ON CONFLICT match it
+        Index("uq_products_name_brand", name, func.coalesce(brand, literal_column("''")), unique=True),
+        # Trigram indexes behind the ILIKE '%term%' name and brand lookups (needs the pg_trgm extension)
+        Index("ix_products_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_products_brand_trgm", "brand", postgresql_using="gin", postgresql_ops={"brand": "gin_trgm_ops"}),
+    )
+
+class SummaryCache(Base):
+    __tablename__ = "summary_cache"
+
+    content_hash = Column(String(64), primary_key=True)
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,354 @@
+import logging
+import math
+import re
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from config import NAME_INDEX, NAME_INDEX_INTERVAL, NAME_INDEX_MAX_CANDIDATES, NAME_INDEX_MIN_SCORE
+from database import SessionLocal
+from models import Product
+
+logger = logging.getLogger(__name__)
+
+# Changes committed this long after a newer updated_at was read are still picked up
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Layout of a posting key: trigram id, then name size in trigrams, then product position
+POSITION_BITS = 28
+SIZE_BITS = 12
+POSITION_MASK = (1 << POSITION_BITS) - 1
+MAX_SIZE = (1 << SIZE_BITS) - 1
+
+_NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+
+
+def trigrams(text: Optional[str]) -> FrozenSet[str]:
+    """
+    The trigrams of `text` as pg_trgm counts them: lowercased alphanumeric
+    words, each padded with two spaces in front and one behind.
+    """
+    words = _NON_ALPHANUMERIC.sub(" ", (text or "").lower()).split()
+    return frozenset(
+        padded[i:i + 3]
+        for padded in (f"  {word} " for word in words)
+        for i in range(len(padded) - 2)
+    )
+
+
+def _micros(value: Optional[datetime]) -> int:
+    return -1 if value is None else (value - EPOCH) // MICROSECOND
+
+
+def _offsets(sizes: np.ndarray) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)])
+
+
+def _segments(offsets: np.ndarray, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    For per-product lists stored back to back from `offsets`: the flat
+    indexes of the lists of `positions`, concatenated, and where each list
+    starts in them and how long it is.
+    """
+    starts = offsets[positions]
+    lengths = offsets[positions + 1] - starts
+    firsts = np.cumsum(lengths) - lengths
+    return np.arange(int(lengths.sum())) + np.repeat(starts - firsts, lengths), firsts, lengths
+
+
+class Grams:
+    """
+    One immutable build of the name index. Per product, by position: its id,
+    name length, updated_at, and the trigram ids of its name and of its brand
+    (only the ones the name lacks), stored back to back. `keys` holds one
+    sorted int64 per name trigram packing (trigram, name size, position), so
+    the products with a trigram and a name size in a range are one slice.
+    Refreshes build a new Grams and swap it in, so lookups never lock.
+    """
+
+    def __init__(self, ids, lengths, updated_at, name_sizes, name_grams, brand_sizes, brand_grams, gram_count: int):
+        self.ids, self.lengths, self.updated_at = ids, lengths, updated_at
+        self.name_sizes, self.name_grams = name_sizes, name_grams
+        self.brand_sizes, self.brand_grams = brand_sizes, brand_grams
+        self.gram_count = gram_count
+        self.name_offsets, self.brand_offsets = _offsets(name_sizes), _offsets(brand_sizes)
+
+        owners = np.repeat(np.arange(len(ids), dtype=np.int64), name_sizes)
+        sizes = np.minimum(name_sizes, MAX_SIZE).astype(np.int64)[owners]
+        self.keys = np.sort((name_grams.astype(np.int64) << (SIZE_BITS + POSITION_BITS)) | (sizes << POSITION_BITS) | owners)
+        self.id_order = np.argsort(ids, kind="stable")
+
+    @staticmethod
+    def encode(rows: list, gram_ids: Dict[str, int]) -> dict:
+        """
+        Arrays for (id, name, brand, updated_at) rows, giving new trigrams the next ids.
+        """
+        name_grams, brand_grams = array("i"), array("i")
+        name_sizes, brand_sizes = array("i"), array("i")
+        for _, name, brand, _ in rows:
+            grams = trigrams(name)
+            extra = trigrams(brand) - grams
+            name_grams.extend(gram_ids.setdefault(gram, len(gram_ids)) for gram in grams)
+            brand_grams.extend(gram_ids.setdefault(gram, len(gram_ids)) for gram in extra)
+            name_sizes.append(len(grams))
+            brand_sizes.append(len(extra))
+        return {
+            "ids": np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+            "lengths": np.fromiter((len(row[1] or "") for row in rows), dtype=np.int32, count=len(rows)),
+            "updated_at": np.fromiter((_micros(row[3]) for row in rows), dtype=np.int64, count=len(rows)),
+            "name_sizes": np.frombuffer(name_sizes, dtype=np.int32),
+            "name_grams": np.frombuffer(name_grams, dtype=np.int32),
+            "brand_sizes": np.frombuffer(brand_sizes, dtype=np.int32),
+            "brand_grams": np.frombuffer(brand_grams, dtype=np.int32),
+        }
+
+    @classmethod
+    def build(cls, rows: list, gram_ids: Dict[str, int]) -> "Grams":
+        return cls(**cls.encode(rows, gram_ids), gram_count=len(gram_ids))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def changed(self, rows: list) -> list:
+        """
+        The rows that are new or whose updated_at differs from the stored one.
+        """
+        if not len(self.ids):
+            return rows
+        sorted_ids = self.ids[self.id_order]
+        found = np.minimum(np.searchsorted(sorted_ids, [row[0] for row in rows]), len(sorted_ids) - 1)
+        return [
+            row for row, i in zip(rows, found)
+            if sorted_ids[i] != row[0] or self.updated_at[self.id_order[i]] != _micros(row[3])
+        ]
+
+    def merge(self, rows: list, gram_ids: Dict[str, int], keep_ids: Optional[np.ndarray] = None) -> "Grams":
+        """
+        Returns a new build with `rows` replacing the stored versions of their
+        ids or added, restricted to `keep_ids` if given.
+        """
+        new = self.encode(rows, gram_ids)
+        keep = ~np.isin(self.ids, new["ids"])
+        if keep_ids is not None:
+            keep &= np.isin(self.ids, keep_ids)
+        kept = np.flatnonzero(keep)
+        name_index, _, _ = _segments(self.name_offsets, kept)
+        brand_index, _, _ = _segments(self.brand_offsets, kept)
+        return Grams(
+            ids=np.concatenate([self.ids[kept], new["ids"]]),
+            lengths=np.concatenate([self.lengths[kept], new["lengths"]]),
+            updated_at=np.concatenate([self.updated_at[kept], new["updated_at"]]),
+            name_sizes=np.concatenate([self.name_sizes[kept], new["name_sizes"]]),
+            name_grams=np.concatenate([self.name_grams[name_index], new["name_grams"]]),
+            brand_sizes=np.concatenate([self.brand_sizes[kept], new["brand_sizes"]]),
+            brand_grams=np.concatenate([self.brand_grams[brand_index], new["brand_grams"]]),
+            gram_count=len(gram_ids),
+        )
+
+    def _slices(self, grams: np.ndarray, size: int, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        # Similarity >= threshold needs threshold * size <= name size <= size / threshold
+        lo = max(1, math.ceil(threshold * size - 1e-9))
+        hi = min(MAX_SIZE, math.floor(size / threshold + 1e-9))
+        base = grams << (SIZE_BITS + POSITION_BITS)
+        return (
+            np.searchsorted(self.keys, base | (lo << POSITION_BITS)),
+            np.searchsorted(self.keys, base | ((hi + 1) << POSITION_BITS)),
+        )
+
+    @staticmethod
+    def _shared(offsets: np.ndarray, grams: np.ndarray, positions: np.ndarray, in_query: np.ndarray) -> np.ndarray:
+        # How many query trigrams each product's list holds
+        index, firsts, lengths = _segments(offsets, positions)
+        # The trailing False keeps every start in range for reduceat
+        hits = np.append(in_query[grams[index]], False)
+        shared = np.add.reduceat(hits, firsts, dtype=np.int64) if len(positions) else np.empty(0, dtype=np.int64)
+        shared[lengths == 0] = 0
+        return shared
+
+    @staticmethod
+    def _scores(shared: np.ndarray, sizes: np.ndarray, size: int) -> np.ndarray:
+        # pg_trgm's similarity(): shared trigrams over the trigrams of either
+        return shared / (size + sizes - shared)
+
+    def lookup(self, query: np.ndarray, size: int, min_score: float, limit: int,
+               max_candidates: int) -> Optional[List[Tuple[int, float]]]:
+        """
+        Matches for the query trigram ids `query` (out of `size` trigrams in
+        all) as NameIndex.lookup returns them, or None if more than
+        `max_candidates` products had to be scored.
+        """
+        in_query = np.zeros(self.gram_count, dtype=bool)
+        in_query[query] = True
+        starts, ends = self._slices(query, size, min_score)
+        # The query's trigrams that any product has, rarest first
+        lists = query[ends > starts][np.argsort((ends - starts)[ends > starts], kind="stable")]
+
+        threshold = min_score
+        seen = positions = np.empty(0, dtype=np.int64)
+        shared = np.empty(0, dtype=np.int64)
+        read = 0
+        while read < len(lists):
+            # Products in none of the lists read so far share at most the rest
+            if (len(lists) - read) / size < threshold:
+                break
+            # Twice as many lists each round, rarest first, so the score to beat
+            # can rise before the common ones; never more than a product must
+            # appear in to beat it
+            upto = min(max(1, 2 * read), len(lists) - math.ceil(threshold * size - 1e-9) + 1)
+            starts, ends = self._slices(lists[read:upto], size, threshold)
+            if (ends - starts).max() > max_candidates:
+                return None
+            found, counts = np.unique(
+                np.concatenate([self.keys[start:end] for start, end in zip(starts, ends)]) & POSITION_MASK,
+                return_counts=True,
+            )
+            new = ~np.isin(found, seen, assume_unique=True, kind="sort")
+            found, counts = found[new], counts[new]
+            if len(seen) + len(found) > max_candidates:
+                return None
+            seen = np.concatenate([seen, found])
+            read = upto
+
+            # A product first read this round shares at most the lists it was
+            # in plus the unread ones; only score those that could still place
+            sizes = self.name_sizes[found]
+            best = np.minimum(counts + len(lists) - read, sizes)
+            found = found[self._scores(best, sizes, size) >= threshold]
+            positions = np.concatenate([positions, found])
+            shared = np.concatenate([shared, self._shared(self.name_offsets, self.name_grams, found, in_query)])
+            if len(positions) >= limit:
+                scores = self._scores(shared, self.name_sizes[positions], size)
+                threshold = max(threshold, float(np.partition(scores, -limit)[-limit]))
+
+        scores = self._scores(shared, self.name_sizes[positions], size)
+        matches = scores >= min_score
+        positions, shared, scores = positions[matches], shared[matches], scores[matches]
+
+        # The brand only breaks ties between names that matched on their own
+        branded = shared + self._shared(self.brand_offsets, self.brand_grams, positions, in_query)
+        branded = self._scores(branded, self.name_sizes[positions] + self.brand_sizes[positions], size)
+        order = np.lexsort((self.ids[positions], self.lengths[positions], -branded, -scores))[:limit]
+        return [(int(self.ids[positions[i]]), float(scores[i])) for i in order]
+
+
+class NameIndex:
+    """
+    Typo-tolerant lookup of products by name, kept in memory as numpy arrays.
+    Each product is indexed under the trigrams of its name. A lookup reads
+    the products with the query's trigrams rarest first, limited to name
+    sizes that can reach the score to beat, and scores the ones that could
+    still place given how many lists they were in; after m trigrams an unread
+    product shares at most size - m of them, so reading stops once that can
+    no longer place. Matches need a pg_trgm similarity of
+    min_score on the name; the brand's trigrams only break ties between them,
+    so "apple iphone" prefers Apple's iPhone while "apple" alone matches no
+    product named otherwise. Queries that need more than max_candidates products
+    scored are too vague to pick one and match nothing.
+    A background thread keeps it current by polling updated_at.
+    """
+
+    def __init__(
+        self,
+        min_score: float = NAME_INDEX_MIN_SCORE,
+        interval: float = NAME_INDEX_INTERVAL,
+        max_candidates: int = NAME_INDEX_MAX_CANDIDATES,
+    ):
+        self.min_score = min_score
+        self.interval = interval
+        self.max_candidates = max_candidates
+        # Only the refresh thread adds trigrams; lookups ignore ids past their build's gram_count
+        self.gram_ids: Dict[str, int] = {}
+        self.grams: Optional[Grams] = None
+        self._thread: Optional[threading.Thread] = None
+        self.watermark: Optional[datetime] = None
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self.grams) if self.grams is not None else 0
+
+    def update(self, rows: list):
+        """
+        Indexes (id, name, brand, updated_at) rows, replacing earlier versions.
+        """
+        grams = self.grams
+        if grams is None:
+            self.grams = Grams.build(rows, self.gram_ids)
+            return
+        rows = grams.changed(rows)
+        if rows:
+            self.grams = grams.merge(rows, self.gram_ids)
+
+    def retain(self, product_ids: Iterable[int]):
+        """
+        Drops every product whose id is not in `product_ids`.
+        """
+        if self.grams is not None:
+            keep_ids = np.fromiter(product_ids, dtype=np.int64)
+            self.grams = self.grams.merge([], self.gram_ids, keep_ids=keep_ids)
+
+    def lookup(self, text: str, limit: int = 5) -> List[Tuple[int, float]]:
+        """
+        Returns up to `limit` (product id, score) pairs whose name scores at
+        least min_score, best first; ties go to the better "brand name"
+        score, then the shorter name, then the lower id.
+        """
+        grams = self.grams
+        query = trigrams(text)
+        if grams is None or not query:
+            return []
+        known = [self.gram_ids[gram] for gram in query if gram in self.gram_ids]
+        query_ids = np.array(sorted(gram for gram in known if gram < grams.gram_count), dtype=np.int64)
+        return grams.lookup(query_ids, len(query), self.min_score, limit, self.max_candidates) or []
+
+    def refresh(self):
+        """
+        Loads every product on the first call, then the ones changed since the
+        watermark. Deletes are noticed when the row count disagrees.
+        """
+        db = SessionLocal()
+        try:
+            query = db.query(Product.id, Product.name, Product.brand, Product.updated_at)
+            if self.watermark is not None:
+                query = query.filter(Product.updated_at >= self.watermark - WATERMARK_OVERLAP)
+            rows = [tuple(row) for row in query]
+            self.update(rows)
+            if self.loaded and db.query(func.count(Product.id)).scalar() != len(self):
+                self.retain(product_id for product_id, in db.query(Product.id))
+
+            seen = [row[3] for row in rows if row[3] is not None]
+            if seen:
+                self.watermark = max([self.watermark, *seen] if self.watermark else seen)
+            if not self.loaded:
+                self.loaded = True
+                logger.info(f"Loaded product name index: {len(self)} products, {len(self.gram_ids)} trigrams")
+        finally:
+            db.close()
+
+    def start(self):
+        """
+        Starts the refresh thread; lookups use the index after its first load.
+        """
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Error refreshing product name index: {e}")
+                time.sleep(self.interval)
+
+        self._thread = threading.Thread(target=run, name="name-index", daemon=True)
+        self._thread.start()
+
+
+name_index = NameIndex() if NAME_INDEX else None
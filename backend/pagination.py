@@ -0,0 +1,69 @@
+import base64
+import json
+import math
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+from config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+
+def page_size(limit: Optional[int]) -> int:
+    """
+    Clamps a requested page size to the server-side maximum.
+    """
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _cursor_value_ok(value: Any, kind: type) -> bool:
+    # bool is a subclass of int, and ids must fit the database's BIGINT
+    if isinstance(value, bool):
+        return False
+    if kind is int:
+        return isinstance(value, int) and -2**63 <= value < 2**63
+    if kind is float:
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    return isinstance(value, kind)
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """
+    Decodes a cursor produced by encode_cursor for a key whose columns hold
+    `types`; anything else is answered with 400 rather than reaching the query.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(types) or not all(map(_cursor_value_ok, values, types)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return [kind(value) for kind, value in zip(types, values)]
+
+
+def keyset_page(query, columns: list, cursor: Optional[str], size: int):
+    """
+    Orders `query` by `columns` and restricts it to the page after `cursor`.
+    One extra row is fetched so split_page can tell whether another page exists.
+    """
+    if cursor:
+        values = decode_cursor(cursor, [column.type.python_type for column in columns])
+        query = query.filter(tuple_(*columns) > tuple_(*values))
+    return query.order_by(*columns).limit(size + 1)
+
+
+def split_page(rows: list, size: int, key: Callable[[Any], List[Any]]) -> Tuple[list, Optional[str]]:
+    """
+    Trims the extra row fetched by keyset_page and returns the page with the
+    cursor for the next one, or None on the last page.
+    """
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor(key(rows[-1]))
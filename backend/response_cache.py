@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.dml import UpdateBase
+
+from config import RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_REDIS_URL
+from metrics import Counter
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_LOOKUPS = Counter("chat_response_cache_total", "Chat response cache lookups", ["result"])
+
+# Writes to these tables can change a chat response
+CATALOG_TABLES = {"products", "suppliers", "categories", "supplier_categories"}
+
+
+class MemoryBackend:
+    """
+    In-process LRU with a per-entry expiry time. Its generation only moves
+    on writes committed by this process; writes from other workers, ingest.py
+    or summarize_catalog.py show up once the entries they affect expire.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self._entries = TTLCache(max_entries)
+        self._generation = 0
+
+    def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    def set(self, key: str, value: str, ttl: float):
+        self._entries.set(key, value, ttl)
+
+    def generation(self) -> int:
+        return self._generation
+
+    def bump(self):
+        self._generation += 1
+        self._entries.clear()
+
+
+class RedisBackend:
+    """
+    Redis (or any server speaking its protocol) shared by every API worker.
+    Entries expire through SETEX; LRU eviction is left to the server's
+    maxmemory-policy (allkeys-lru). The generation is a shared counter, so
+    a write committed by any process that imports this module (API workers,
+    ingest.py, summarize_catalog.py) invalidates the cache for all of them.
+    """
+
+    def __init__(self, url: str = RESPONSE_CACHE_REDIS_URL, prefix: str = "supplybot:chat:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float):
+        self.client.setex(self.prefix + key, max(1, int(ttl)), value)
+
+    def generation(self) -> int:
+        return int(self.client.get(self.prefix + "generation") or 0)
+
+    def bump(self):
+        self.client.incr(self.prefix + "generation")
+
+
+class ResponseCache:
+    """
+    Caches chat response bodies under the parsed intent and entities plus
+    the paging arguments, so differently worded queries share an entry.
+    Keys carry the catalog generation, which committed writes to a catalog
+    table bump. Only the Redis backend shares it between processes; with the
+    memory backend a write made elsewhere can be served stale for up to the TTL.
+    Backend errors are logged and treated as misses.
+    """
+
+    def __init__(self, backend, ttl: float = RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def generation(self) -> Optional[int]:
+        """
+        The generation to key a request on, read before its database lookups.
+        """
+        try:
+            return self.backend.generation()
+        except Exception as e:
+            logger.error(f"Error reading response cache generation: {e}")
+            return None
+
+    @staticmethod
+    def key(generation: int, parsed: Dict[str, Any], size: int, cursor: Optional[str]) -> str:
+        entities = sorted(parsed["entities"].items())
+        payload = json.dumps([parsed["intent"], entities, size, cursor])
+        return f"{generation}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.error(f"Error reading response cache: {e}")
+            value = None
+        RESPONSE_CACHE_LOOKUPS.inc(result="miss" if value is None else "hit")
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, body: Dict[str, Any]):
+        try:
+            self.backend.set(key, json.dumps(body), self.ttl)
+        except Exception as e:
+            logger.error(f"Error writing response cache: {e}")
+
+    def invalidate(self):
+        try:
+            self.backend.bump()
+        except Exception as e:
+            logger.error(f"Error invalidating response cache: {e}")
+
+
+def _make_cache() -> Optional[ResponseCache]:
+    if RESPONSE_CACHE_BACKEND == "off":
+        return None
+    if RESPONSE_CACHE_BACKEND == "redis":
+        try:
+            return ResponseCache(RedisBackend())
+        except ImportError:
+            logger.error("RESPONSE_CACHE_BACKEND=redis needs the redis package; using the in-process cache.")
+    return ResponseCache(MemoryBackend())
+
+
+response_cache = _make_cache()
+
+
+# Every engine in this process, including the async engine's sync core, reports
+# its writes here. ORM flushes and Core upserts both go through Connection.execute.
+@event.listens_for(Engine, "after_execute")
+def _note_catalog_write(conn, clauseelement, multiparams, params, execution_options, result):
+    if isinstance(clauseelement, UpdateBase) and getattr(clauseelement.table, "name", None) in CATALOG_TABLES:
+        conn.info["catalog_written"] = True
+
+
+@event.listens_for(Engine, "commit")
+def _invalidate_on_commit(conn):
+    if conn.info.pop("catalog_written", False) and response_cache is not None:
+        response_cache.invalidate()
+
+
+@event.listens_for(Engine, "rollback")
+def _forget_rolled_back_write(conn):
+    conn.info.pop("catalog_written", None)
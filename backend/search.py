@@ -0,0 +1,30 @@
+from sqlalchemy import func
+
+from database import engine
+
+# pg_trgm's similarity() is only available on Postgres
+TRIGRAM_SEARCH = engine.dialect.name == "postgresql"
+
+
+def contains(column, term: str):
+    """
+    Substring filter for `column`; on Postgres it is served by the trigram GIN index.
+    """
+    return column.ilike(f"%{term}%")
+
+
+def best_match(column, term: str):
+    """
+    Ordering that puts the closest match for `term` first: trigram similarity
+    on Postgres, and the shortest containing value elsewhere.
+    """
+    if TRIGRAM_SEARCH:
+        return func.similarity(column, term).desc()
+    return func.length(column)
+
+
+def search(query, column, term: str):
+    """
+    Restricts `query` to rows whose `column` contains `term`, best match first.
+    """
+    return query.filter(contains(column, term)).order_by(best_match(column, term))
@@ -0,0 +1,391 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import inference
+from config import (
+    EMBEDDING_MODEL,
+    MODEL_WAIT_FOR_LOAD,
+    SEMANTIC_INDEX_DIR,
+    SEMANTIC_TOP_K,
+    SEMANTIC_MIN_SCORE,
+    SEMANTIC_IVF_MIN_ROWS,
+    SEMANTIC_NPROBE,
+    SEMANTIC_RELOAD_INTERVAL,
+)
+from database import SessionLocal
+from models import Product, Supplier
+
+logger = logging.getLogger(__name__)
+
+# Kind code stored next to each vector
+KINDS = {"product": 0, "supplier": 1}
+KIND_NAMES = {code: kind for kind, code in KINDS.items()}
+MODELS = {"product": Product, "supplier": Supplier}
+
+# Per-row arrays kept in step with each other; unused slots have kind -1
+ARRAYS = {"vectors": np.float16, "kinds": np.int8, "ids": np.int64, "lists": np.int32}
+
+# Incremental refreshes re-read rows this far behind the watermark, to catch transactions that committed late
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+def product_document(product: Product) -> str:
+    return f"{product.name}. {product.brand}. {product.category}. {product.description or ''}"
+
+
+def supplier_document(supplier: Supplier) -> str:
+    return f"{supplier.name}. Offers {supplier.product_categories_offered}. {supplier.contact_info}"
+
+
+DOCUMENTS = {"product": product_document, "supplier": supplier_document}
+
+
+class SemanticIndex:
+    """
+    Unit-length sentence embeddings of every product and supplier, kept as
+    memory-mapped .npy files in `path`: float16 vectors plus the kind, id and
+    k-means list of each row, with meta.json holding the row count and a
+    version. One writer (this module's CLI) appends and overwrites rows; API
+    processes map the files read-only and reopen them when the version changes.
+
+    Search is a single matrix-vector product over every row, or, once the
+    index is clustered, over the rows of the `nprobe` lists whose centroids
+    are closest to the query (an inverted-file index).
+    """
+
+    def __init__(self, path: str = SEMANTIC_INDEX_DIR):
+        self.path = path
+        self.meta: Optional[dict] = None
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.npy")
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.path, "meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def open(self, writable: bool = False) -> bool:
+        """
+        Maps the index files; returns False if no index has been built yet.
+        """
+        meta = self._read_meta()
+        if meta is None:
+            return False
+        arrays = {name: np.load(self._file(name), mmap_mode="r+" if writable else "r") for name in ARRAYS}
+        centroids = np.load(self._file("centroids")) if meta.get("nlist") else None
+
+        lists = None
+        if centroids is not None:
+            # Rows of each list: order[bounds[l]:bounds[l + 1]]
+            assigned = np.asarray(arrays["lists"][:meta["count"]])
+            order = np.argsort(assigned, kind="stable")
+            bounds = np.searchsorted(assigned[order], np.arange(len(centroids) + 1))
+            lists = (order, bounds)
+
+        with self._lock:
+            self.meta, self._arrays, self._centroids, self._lists = meta, arrays, centroids, lists
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < SEMANTIC_RELOAD_INTERVAL:
+            return
+        self._checked_at = now
+        meta = self._read_meta()
+        if meta is not None and (self.meta is None or meta["version"] != self.meta["version"]):
+            try:
+                self.open()
+            except (OSError, ValueError) as e:
+                logger.error(f"Error opening semantic index: {e}")
+
+    def available(self) -> bool:
+        self._maybe_reload()
+        return self.meta is not None and self.meta["count"] > 0
+
+    def search(self, vector: List[float], k: int = SEMANTIC_TOP_K, nprobe: int = SEMANTIC_NPROBE):
+        """
+        Returns up to `k` (kind, id, cosine similarity) tuples, best first.
+        """
+        self._maybe_reload()
+        with self._lock:
+            meta, arrays, centroids, lists = self.meta, self._arrays, self._centroids, self._lists
+        if meta is None or meta["count"] == 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        if centroids is not None:
+            order, bounds = lists
+            nearest = np.argsort(centroids @ query)[-nprobe:]
+            rows = np.sort(np.concatenate([order[bounds[l]:bounds[l + 1]] for l in nearest]))
+        else:
+            rows = np.arange(meta["count"])
+        kinds = arrays["kinds"][rows]
+        rows, kinds = rows[kinds >= 0], kinds[kinds >= 0]  # skip rows of deleted entries
+        if len(rows) == 0:
+            return []
+
+        scores = arrays["vectors"][rows].astype(np.float32) @ query
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+
+        ids = arrays["ids"]
+        return [(KIND_NAMES[int(kinds[i])], int(ids[rows[i]]), float(scores[i])) for i in top]
+
+    # Writer side
+
+    def _create(self, dim: int):
+        os.makedirs(self.path, exist_ok=True)
+        for name, dtype in ARRAYS.items():
+            shape = (0, dim) if name == "vectors" else (0,)
+            np.save(self._file(name), np.zeros(shape, dtype=dtype))
+        self.meta = {"count": 0, "dim": dim, "model": EMBEDDING_MODEL, "nlist": 0, "version": 0, "watermark": None}
+        self._write_meta()
+        self.open(writable=True)
+
+    def _ensure_capacity(self, needed: int):
+        capacity = len(self._arrays["ids"])
+        if needed <= capacity:
+            return
+        grown_capacity = max(needed, capacity * 2, 1024)
+        for name, array in self._arrays.items():
+            # Grow into a new file so readers keep their mapping of the old one
+            tmp = self._file(name) + ".tmp"
+            grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=array.dtype, shape=(grown_capacity, *array.shape[1:]))
+            grown[:capacity] = array
+            if name in ("kinds", "lists"):
+                grown[capacity:] = -1
+            grown.flush()
+            del grown
+            os.replace(tmp, self._file(name))
+        self._arrays = {name: np.load(self._file(name), mmap_mode="r+") for name in ARRAYS}
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self._centroids is None:
+            return np.full(len(vectors), -1, dtype=np.int32)
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def upsert(self, kind: str, ids: List[int], vectors: List[List[float]]):
+        """
+        Stores the vectors of `ids`, overwriting the rows they already have.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.meta is None:
+            self._create(vectors.shape[1])
+
+        code = KINDS[kind]
+        count = self.meta["count"]
+        rows: Dict[int, int] = {}
+        if count:
+            present = (self._arrays["kinds"][:count] == code) & np.isin(self._arrays["ids"][:count], ids)
+            for row in np.flatnonzero(present):
+                rows[int(self._arrays["ids"][row])] = int(row)
+        for id_ in ids:
+            if id_ not in rows:
+                rows[id_] = count
+                count += 1
+
+        self._ensure_capacity(count)
+        positions = np.asarray([rows[id_] for id_ in ids])
+        self._arrays["vectors"][positions] = vectors.astype(np.float16)
+        self._arrays["kinds"][positions] = code
+        self._arrays["ids"][positions] = ids
+        self._arrays["lists"][positions] = self._assign(vectors)
+        self.meta["count"] = count
+
+    def remove_missing(self, kind: str, ids: np.ndarray) -> int:
+        """
+        Frees the rows of `kind` whose id is not in `ids`; returns how many were removed.
+        """
+        count = self.meta["count"]
+        kinds = self._arrays["kinds"]
+        gone = np.flatnonzero((kinds[:count] == KINDS[kind]) & ~np.isin(self._arrays["ids"][:count], ids))
+        kinds[gone] = -1
+        return len(gone)
+
+    def cluster(self, iterations: int = 10, seed: int = 0):
+        """
+        Trains about sqrt(count) spherical k-means centroids on a sample of
+        the vectors and assigns every row to its nearest one.
+        """
+        count = self.meta["count"]
+        nlist = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(count, size=min(count, nlist * 32), replace=False))
+        sample = self._arrays["vectors"][sample_rows].astype(np.float32)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assigned = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assigned, sample)
+            filled = np.bincount(assigned, minlength=nlist) > 0
+            norms = np.linalg.norm(sums[filled], axis=1, keepdims=True)
+            centroids[filled] = sums[filled] / np.maximum(norms, 1e-12)
+
+        self._centroids = centroids
+        for start in range(0, count, 65536):
+            block = self._arrays["vectors"][start:start + 65536].astype(np.float32)
+            self._arrays["lists"][start:start + len(block)] = self._assign(block)
+        np.save(self._file("centroids"), centroids)
+        self.meta["nlist"] = nlist
+        logger.info(f"Clustered {count} vectors into {nlist} lists")
+
+    def _write_meta(self):
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def save(self, **updates):
+        """
+        Flushes the arrays and publishes the new row count to readers.
+        """
+        for array in self._arrays.values():
+            array.flush()
+        self.meta.update(updates)
+        self.meta["version"] += 1
+        self._write_meta()
+
+
+semantic_index = SemanticIndex()
+
+
+def nearest_many(questions: List[str], k: int = SEMANTIC_TOP_K) -> Dict[str, Optional[List[Tuple[str, int, float]]]]:
+    """
+    Embeds the questions in one model call and searches the index for each,
+    keeping the (kind, id, similarity) hits above SEMANTIC_MIN_SCORE. Needs no
+    database, so the async endpoint runs it on the inference executor.
+    Questions that could not be searched, because there is no index yet or
+    the embedder was unavailable or failed, map to None rather than to no hits.
+    """
+    hits: Dict[str, Optional[List[Tuple[str, int, float]]]] = {question: None for question in questions}
+    questions = list(hits)
+    if not questions or not semantic_index.available():
+        return hits
+    vectors = inference.embed(questions, wait=MODEL_WAIT_FOR_LOAD)
+    for question, vector in zip(questions, vectors or []):
+        if vector is not None:
+            hits[question] = [hit for hit in semantic_index.search(vector, k) if hit[2] >= SEMANTIC_MIN_SCORE]
+    return hits
+
+
+def similar_rows_many(
+    db, questions: List[str], k: int = SEMANTIC_TOP_K, hits: Optional[Dict[str, Optional[List[Tuple[str, int, float]]]]] = None
+) -> Dict[str, Optional[List[Tuple[object, float]]]]:
+    """
+    Returns the products and suppliers closest to each question with their
+    similarity, best first and above SEMANTIC_MIN_SCORE, fetching the rows
+    with one query per kind; None for a question nearest_many could not
+    search. `hits` are nearest_many results computed beforehand; without
+    them the questions are embedded here.
+    """
+    if hits is None:
+        hits = nearest_many(questions, k)
+    wanted = {kind: set() for kind in KINDS}
+    for question in questions:
+        for kind, id_, _ in hits.get(question) or ():
+            wanted[kind].add(id_)
+
+    rows = {
+        kind: {row.id: row for row in db.query(MODELS[kind]).filter(MODELS[kind].id.in_(ids))}
+        for kind, ids in wanted.items()
+        if ids
+    }
+    # Rows deleted since they were indexed are skipped
+    return {
+        question: None if hits.get(question) is None else [
+            (rows[kind][id_], score) for kind, id_, score in hits[question] if id_ in rows.get(kind, {})
+        ]
+        for question in questions
+    }
+
+
+def refresh(index: SemanticIndex, batch_size: int = 64) -> int:
+    """
+    Embeds every product and supplier changed since the previous refresh
+    (everything on the first run), clusters the index once it is large
+    enough, and publishes the result. Returns the number of rows embedded.
+    """
+    started = datetime.utcnow()
+    watermark = index.meta.get("watermark") if index.meta else None
+    since = datetime.fromisoformat(watermark) - WATERMARK_OVERLAP if watermark else None
+
+    total = 0
+    db = SessionLocal()
+    try:
+        for kind, model in MODELS.items():
+            last_id = 0
+            while True:
+                query = db.query(model).filter(model.id > last_id)
+                if since is not None:
+                    query = query.filter(model.updated_at >= since)
+                rows = query.order_by(model.id).limit(batch_size).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                vectors = inference.embed([DOCUMENTS[kind](row) for row in rows])
+                if vectors is None:
+                    raise RuntimeError("The embedding model is unavailable.")
+                embedded = [(row.id, vector) for row, vector in zip(rows, vectors) if vector is not None]
+                if embedded:
+                    index.upsert(kind, [id_ for id_, _ in embedded], [vector for _, vector in embedded])
+                total += len(embedded)
+                db.expunge_all()
+
+            # Deletes leave no updated_at behind, so compare against the ids that still exist
+            if index.meta is not None:
+                ids = np.fromiter((id_ for id_, in db.query(model.id)), dtype=np.int64)
+                removed = index.remove_missing(kind, ids)
+                if removed:
+                    logger.info(f"Removed {removed} deleted {kind} rows from the semantic index")
+    finally:
+        db.close()
+
+    if index.meta is None:
+        return 0
+    if not index.meta["nlist"] and index.meta["count"] >= SEMANTIC_IVF_MIN_ROWS:
+        index.cluster()
+    index.save(watermark=started.isoformat())
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the semantic index of products and suppliers.")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the index and embed every row again")
+    parser.add_argument("--watch", type=float, default=0, help="Keep running and refresh every N seconds")
+    parser.add_argument("--batch-size", type=int, default=64, help="Rows embedded per model call")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.rebuild and os.path.isdir(SEMANTIC_INDEX_DIR):
+        shutil.rmtree(SEMANTIC_INDEX_DIR)
+
+    writer = SemanticIndex()
+    writer.open(writable=True)
+    while True:
+        started = time.perf_counter()
+        embedded = refresh(writer, args.batch_size)
+        count = writer.meta["count"] if writer.meta else 0
+        print(f"Embedded {embedded} rows in {time.perf_counter() - started:.1f}s; index holds {count} rows")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
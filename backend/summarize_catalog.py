@@ -0,0 +1,144 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import inspect, text, update, or_
+
+from database import engine, SessionLocal
+from models import Product, Supplier
+from model_registry import configure_torch_threads
+import response_cache  # noqa: F401 (its commit listeners invalidate the shared chat response cache)
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLUMNS = {
+    "summary": "TEXT",
+    "updated_at": "TIMESTAMP",
+    "summarized_at": "TIMESTAMP",
+}
+
+
+def ensure_summary_columns():
+    """
+    Adds the summary bookkeeping columns to tables created before they existed.
+    Rows without an updated_at get one so the job can track them from now on.
+    The API runs this at startup, since every product query reads the columns.
+    """
+    inspector = inspect(engine)
+    # Postgres tolerates API workers that start together racing to add the same column
+    add_column = "ADD COLUMN IF NOT EXISTS" if engine.dialect.name == "postgresql" else "ADD COLUMN"
+    with engine.begin() as conn:
+        for model in (Product, Supplier):
+            table = model.__tablename__
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, ddl_type in SUMMARY_COLUMNS.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} {add_column} {name} {ddl_type}"))
+            conn.execute(update(model).where(model.updated_at.is_(None)).values(updated_at=datetime.utcnow()))
+
+
+def product_text(product: Product) -> Optional[str]:
+    return product.description
+
+
+def _init_worker(workers: int):
+    # Connections inherited from the parent process must not be reused here
+    engine.dispose(close=False)
+    # Share the cores between the worker processes instead of each using all of them
+    configure_torch_threads(workers)
+
+
+def _summarize_batch(texts: List[Optional[str]]) -> List[Optional[str]]:
+    from chatbot import FALLBACK_RESPONSE, summarize_many
+
+    summaries, degraded = summarize_many(texts, batch_size=len(texts), wait=True)
+    if degraded:
+        # Texts the summarizer never answered come back as they were; leave those rows pending too
+        return [FALLBACK_RESPONSE if summary == text else summary for summary, text in zip(summaries, texts)]
+    return summaries
+
+
+def pending_rows(db, model, after_id: int, chunk_size: int) -> list:
+    """
+    Returns the next chunk of rows that are new or changed since they were last summarized.
+    """
+    return (
+        db.query(model)
+        .filter(model.id > after_id)
+        .filter(or_(model.summarized_at.is_(None), model.updated_at != model.summarized_at))
+        .order_by(model.id)
+        .limit(chunk_size)
+        .all()
+    )
+
+
+def summarize_table(pool: ProcessPoolExecutor, model, text_for, chunk_size: int, batch_size: int) -> int:
+    """
+    Walks `model` in id order and stores a summary for every pending row.
+    Returns the number of rows updated.
+    """
+    from chatbot import FALLBACK_RESPONSE
+
+    updated = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = pending_rows(db, model, last_id, chunk_size)
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            texts = [text_for(row) for row in rows]
+            batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+            summaries = [summary for batch in pool.map(_summarize_batch, batches) for summary in batch]
+
+            for row, summary in zip(rows, summaries):
+                if summary == FALLBACK_RESPONSE:
+                    continue  # Leave the row pending so the next run retries it
+
+                # Only write if the row wasn't edited while it was being summarized.
+                # Setting updated_at explicitly keeps its onupdate from firing.
+                result = db.execute(
+                    update(model)
+                    .where(model.id == row.id)
+                    .where(model.updated_at == row.updated_at)
+                    .values(summary=summary, summarized_at=row.updated_at, updated_at=row.updated_at)
+                )
+                updated += result.rowcount
+            db.commit()
+            db.expunge_all()
+            logger.info(f"{model.__tablename__}: summarized up to id {last_id} ({updated} rows so far)")
+    finally:
+        db.close()
+    return updated
+
+
+def run(chunk_size: int = 500, batch_size: int = 16, workers: int = 2):
+    """
+    Precomputes summaries for every product and supplier that is new or
+    changed since the previous run.
+    """
+    from chatbot import supplier_profile
+
+    ensure_summary_columns()
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workers,)) as pool:
+        products = summarize_table(pool, Product, product_text, chunk_size, batch_size)
+        suppliers = summarize_table(pool, Supplier, supplier_profile, chunk_size, batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Summarized {products} products and {suppliers} suppliers in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute product and supplier summaries.")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Rows read from the database per chunk")
+    parser.add_argument("--batch-size", type=int, default=16, help="Texts per summarizer batch")
+    parser.add_argument("--workers", type=int, default=2, help="Summarization worker processes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run(chunk_size=args.chunk_size, batch_size=args.batch_size, workers=args.workers)
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import SUMMARIZER_MODEL, SUMMARY_CACHE_SIZE, SUMMARY_CACHE_PERSIST, SUMMARY_CACHE_MAX_AGE_DAYS
+from database import SessionLocal, engine
+from models import SummaryCache
+
+logger = logging.getLogger(__name__)
+
+# Hashes per SELECT when reading summaries back from the table
+LOOKUP_CHUNK_SIZE = 500
+# Seconds between prunes of old rows from the table
+PRUNE_INTERVAL = 3600
+
+
+def content_hash(text: str) -> str:
+    """
+    Returns the cache key for a piece of source text.
+    The summarizer model name is part of the key so that switching models
+    never serves summaries produced by a different one.
+    """
+    return hashlib.sha256(f"{SUMMARIZER_MODEL}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class SummaryStore:
+    """
+    Two-level cache for summaries: an in-memory LRU in front of the
+    `summary_cache` table. Entries are keyed on the hash of the source text,
+    so a changed description simply misses and gets summarized again; the
+    old row is pruned once it is older than max_age_days.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SUMMARY_CACHE_SIZE,
+        persist: bool = SUMMARY_CACHE_PERSIST,
+        max_age_days: float = SUMMARY_CACHE_MAX_AGE_DAYS,
+    ):
+        self.max_entries = max_entries
+        self.persist = persist
+        self.max_age_days = max_age_days
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self._pruned_at: Optional[float] = None
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            SummaryCache.__table__.create(bind=engine, checkfirst=True)
+            self._table_ready = True
+
+    def _remember(self, key: str, summary: str):
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_many(self, texts: List[str]) -> Dict[str, str]:
+        """
+        Returns the cached summaries of `texts` by text. Texts missing from
+        memory are looked up in the table with one query per LOOKUP_CHUNK_SIZE.
+        """
+        found: Dict[str, str] = {}
+        wanted: Dict[str, str] = {}
+        with self._lock:
+            for text in texts:
+                key = content_hash(text)
+                summary = self._entries.get(key)
+                if summary is not None:
+                    self._entries.move_to_end(key)
+                    found[text] = summary
+                else:
+                    wanted[key] = text
+
+        if not wanted or not self.persist:
+            return found
+
+        keys = list(wanted)
+        try:
+            self._ensure_table()
+            db = SessionLocal()
+            try:
+                rows = [
+                    row
+                    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE)
+                    for row in db.query(SummaryCache.content_hash, SummaryCache.summary).filter(
+                        SummaryCache.content_hash.in_(keys[start:start + LOOKUP_CHUNK_SIZE])
+                    )
+                ]
+            finally:
+                db.close()
+        except SQLAlchemyError as e:
+            logger.error(f"Error reading summary cache: {e}")
+            return found
+
+        for key, summary in rows:
+            self._remember(key, summary)
+            found[wanted[key]] = summary
+        return found
+
+    def set_many(self, summaries: Dict[str, str]):
+        """
+        Stores freshly computed summaries by text, persisting them in one transaction.
+        """
+        rows = {content_hash(text): summary for text, summary in summaries.items()}
+        for key, summary in rows.items():
+            self._remember(key, summary)
+
+        if not self.persist or not rows:
+            return
+
+        dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+        try:
+            self._ensure_table()
+            with engine.begin() as conn:
+                # A concurrent request may have stored the same text's summary first
+                conn.execute(
+                    dialect.insert(SummaryCache.__table__).on_conflict_do_nothing(),
+                    [
+                        {"content_hash": key, "summary": summary, "created_at": datetime.utcnow()}
+                        for key, summary in rows.items()
+                    ],
+                )
+                self._prune(conn)
+        except SQLAlchemyError as e:
+            logger.error(f"Error writing summary cache: {e}")
+
+    def _prune(self, conn):
+        # At most once per PRUNE_INTERVAL per process, drop rows older than max_age_days
+        now = time.monotonic()
+        if self.max_age_days <= 0 or (self._pruned_at is not None and now - self._pruned_at < PRUNE_INTERVAL):
+            return
+        self._pruned_at = now
+        cutoff = datetime.utcnow() - timedelta(days=self.max_age_days)
+        conn.execute(delete(SummaryCache).where(SummaryCache.created_at < cutoff))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+summary_cache = SummaryStore()
+
@@ -1,5 +1,4 @@
 import React, { useState } from "react";
-import axios from "axios";
 import { useNavigate } from "react-router-dom";
 
 function Chatbot() {
@@ -57,19 +56,9 @@ function Chatbot() {
     );
   };
 
-  // Helper component to render comparison objects
+  // Helper component to render comparisons: one column per product, one row per feature
   const ComparisonTable = ({ data }) => {
-    if (!isObject(data)) return null;
-
-    const keys = Object.keys(data);
-    if (keys.length !== 2) return null; // Assuming comparison between two items
-
-    const itemA = data[keys[0]];
-    const itemB = data[keys[1]];
-
-    const allKeys = Array.from(
-      new Set([...Object.keys(itemA), ...Object.keys(itemB)])
-    );
+    if (!isObject(data) || !Array.isArray(data.columns) || !Array.isArray(data.rows)) return null;
 
     return (
       <table className="min-w-full bg-white border rounded-lg overflow-hidden">
@@ -78,26 +67,30 @@ function Chatbot() {
             <th className="py-2 px-4 border-b bg-blue-200 text-left text-sm font-semibold text-gray-800">
               Feature
             </th>
-            <th className="py-2 px-4 border-b bg-blue-200 text-left text-sm font-semibold text-gray-800">
-              {keys[0]}
-            </th>
-            <th className="py-2 px-4 border-b bg-blue-200 text-left text-sm font-semibold text-gray-800">
-              {keys[1]}
-            </th>
+            {data.columns.map((column, idx) => (
+              <th
+                key={idx}
+                className="py-2 px-4 border-b bg-blue-200 text-left text-sm font-semibold text-gray-800"
+              >
+                {column}
+              </th>
+            ))}
           </tr>
         </thead>
         <tbody>
-          {allKeys.map((key, idx) => (
-            <tr key={idx} className="hover:bg-blue-50">
-              <td className="py-2 px-4 border-b text-sm text-gray-700">
-                {key.charAt(0).toUpperCase() + key.slice(1)}
-              </td>
-              <td className="py-2 px-4 border-b text-sm text-gray-700">
-                {itemA[key] || "N/A"}
-              </td>
+          {data.rows.map((row, rowIdx) => (
+            <tr key={rowIdx} className="hover:bg-blue-50">
               <td className="py-2 px-4 border-b text-sm text-gray-700">
-                {itemB[key] || "N/A"}
+                {row.feature}
               </td>
+              {data.columns.map((_, colIdx) => (
+                <td
+                  key={colIdx}
+                  className="py-2 px-4 border-b text-sm text-gray-700"
+                >
+                  {row.values[colIdx] ?? "N/A"}
+                </td>
+              ))}
             </tr>
           ))}
         </tbody>
@@ -126,31 +119,78 @@ function Chatbot() {
     }
   };
 
+  // Apply one NDJSON event from /api/chat/stream to the bot message being built
+  const applyStreamEvent = (text, event) => {
+    if (event.type === "rows") {
+      const rows = Array.isArray(text) ? [...text] : [];
+      event.rows.forEach((row, idx) => {
+        rows[event.offset + idx] = row;
+      });
+      return rows;
+    }
+    if (event.type === "summary" && Array.isArray(text)) {
+      const rows = [...text];
+      rows[event.index] = { ...rows[event.index], [event.field]: event.value };
+      return rows;
+    }
+    if (event.type === "response") {
+      return event.response;
+    }
+    if (event.type === "error") {
+      return `Error: ${event.detail}`;
+    }
+    return text;
+  };
+
   // Handle message sending
   const handleSend = async () => {
     if (!query.trim()) return;
 
     const userMessage = { sender: "user", text: query };
-    setMessages((prev) => [...prev, userMessage]);
+    const botId = Date.now();
+    setMessages((prev) => [
+      ...prev,
+      userMessage,
+      { id: botId, sender: "bot", text: "..." },
+    ]);
+
+    const updateBotMessage = (update) =>
+      setMessages((prev) =>
+        prev.map((msg) =>
+          msg.id === botId ? { ...msg, text: update(msg.text) } : msg
+        )
+      );
 
     try {
       const token = localStorage.getItem("token"); // Get the token from localStorage
-      const response = await axios.post(
-        "http://127.0.0.1:8000/api/chat",
-        null,
+      const response = await fetch(
+        `http://127.0.0.1:8000/api/chat/stream?${new URLSearchParams({ query })}`,
         {
-          params: { query },
+          method: "POST",
           headers: { Authorization: `Bearer ${token}` }, // Include the token in headers
         }
       );
+      if (!response.ok || !response.body) {
+        throw new Error(`Request failed with status ${response.status}`);
+      }
 
-      const botMessage = { sender: "bot", text: response.data.response };
-      setMessages((prev) => [...prev, botMessage]);
+      // Render rows as they arrive; each line of the body is one JSON event
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+        const events = lines.filter((line) => line.trim()).map((line) => JSON.parse(line));
+        if (events.length > 0) {
+          updateBotMessage((text) => events.reduce(applyStreamEvent, text));
+        }
+      }
     } catch (error) {
-      setMessages((prev) => [
-        ...prev,
-        { sender: "bot", text: "Error: Unable to fetch a response." },
-      ]);
+      updateBotMessage(() => "Error: Unable to fetch a response.");
     } finally {
       setQuery("");
     }